@@ -7,16 +7,14 @@ from .constants import (
     SCHEDULE_FILE,
     ROTINAS_DISPONIVEIS
 )
+from utils.state_files import gravar_json, ler_json
 
 def carregar_configuracoes():
     """Lê o rotinas_config.json com as rotinas ativas/inativas."""
     if os.path.exists(CONFIG_FILE):
         try:
-            with open(CONFIG_FILE, "r") as f:
-                content = f.read().strip()
-                if not content:  # Verifica se o arquivo está vazio
-                    raise ValueError("Arquivo JSON está vazio.")
-                return json.loads(content)
+            # Gravações são atômicas (utils/state_files.py): nunca lê arquivo pela metade
+            return ler_json(CONFIG_FILE)
         except (json.JSONDecodeError, ValueError) as e:
             st.error(f"Erro ao carregar o arquivo de configurações: {e}")
             # Cria um arquivo de configuração padrão vazio
@@ -31,8 +29,7 @@ def carregar_configuracoes():
 
 def salvar_configuracoes(config):
     """Salva as rotinas ativas/inativas em rotinas_config.json."""
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(config, f, indent=4)
+    gravar_json(CONFIG_FILE, config, bloquear=True)
 
 def carregar_horario():
     """
@@ -49,11 +46,7 @@ def carregar_horario():
     """
     if os.path.exists(SCHEDULE_FILE):
         try:
-            with open(SCHEDULE_FILE, "r") as f:
-                content = f.read().strip()
-                if not content:
-                    raise ValueError("Arquivo JSON está vazio.")
-                return json.loads(content)
+            return ler_json(SCHEDULE_FILE)
         except (json.JSONDecodeError, ValueError) as e:
             st.error(f"Erro ao carregar o arquivo de agendamento: {e}")
             config_padrao = {
@@ -87,42 +80,4 @@ def salvar_horario(config):
     o scheduler a detectar a mudança.
     """
     config["ultima_modificacao"] = str(time.time())
-    with open(SCHEDULE_FILE, "w") as f:
-        json.dump(config, f, indent=4)
-
-def aplicar_override_config(override: dict) -> dict:
-    """
-    Aplica overrides no rotinas_config.json e retorna o dicionário anterior (backup).
-    """
-    from .constants import CONFIG_FILE
-    import json
-    
-    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-        original = json.load(f)
-    backup = dict(original)
-
-    if override is not None:
-        if "__all__" in override:
-            set_all = override["__all__"]
-            for k in backup.keys():
-                backup[k] = bool(set_all)
-            del override["__all__"]
-
-        for k, v in override.items():
-            backup[k] = v
-
-    with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-        json.dump(backup, f, indent=4)
-
-    return original
-
-
-def restaurar_config(config_anterior: dict):
-    """Restaura a configuração original no rotinas_config.json."""
-    from .constants import CONFIG_FILE
-    import json
-
-    if config_anterior is None:
-        return
-    with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-        json.dump(config_anterior, f, indent=4)
\ No newline at end of file
+    gravar_json(SCHEDULE_FILE, config, bloquear=True)
@@ -11,6 +11,14 @@ LOG_DIRECTORY = r"\\192.168.1.213\Arquivos\Administrativo\TecInfo\DESENVOLVIMENT
 
 INTERVALO_MINIMO = 30
 
+# Execução manual: quanto esperar (s) se outra execução estiver com o
+# override no rotinas_config.json, antes de desistir com um aviso na tela
+ESPERA_CONFIG_MANUAL = 20
+AVISO_CONFIG_EM_USO = (
+    "Outra execução está usando o rotinas_config.json. "
+    "Tente novamente quando ela terminar."
+)
+
 # Rotinas disponíveis
 ROTINAS_DISPONIVEIS = [
     ("Visitas do Vendedor", "012011"),
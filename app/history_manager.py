@@ -0,0 +1,77 @@
+# app/history_manager.py
+import sqlite3
+import datetime
+
+import streamlit as st
+
+from utils.run_history import caminho_db, tarefas, listar_execucoes, resumo_por_tarefa, duracoes_diarias
+
+def _formatar_bytes(valor):
+    if valor is None or valor != valor:
+        return ""
+    for unidade in ("B", "KB", "MB", "GB"):
+        if abs(valor) < 1024 or unidade == "GB":
+            return f"{valor:.0f} {unidade}" if unidade == "B" else f"{valor:.1f} {unidade}"
+        valor /= 1024
+
+def historico():
+    """Página do Streamlit com o histórico de execuções (scheduler e manuais)."""
+    st.title("Histórico de Execuções")
+    st.write("Duração, código de saída e consumo de cada execução registrada.")
+
+    try:
+        _exibir_historico()
+    except sqlite3.Error as e:
+        st.error(f"Não foi possível ler o histórico ({caminho_db()}): {e}")
+
+def _exibir_historico():
+    hoje = datetime.date.today()
+    col_tarefa, col_periodo = st.columns([2, 3])
+    tarefa = col_tarefa.selectbox("Tarefa", ["Todas"] + tarefas())
+    periodo = col_periodo.date_input("Período", value=(hoje.replace(day=1), hoje))
+    if isinstance(periodo, (tuple, list)):
+        inicio = periodo[0]
+        fim = periodo[1] if len(periodo) > 1 else periodo[0]
+    else:
+        inicio = fim = periodo
+    desde = datetime.datetime.combine(inicio, datetime.time.min)
+    ate = datetime.datetime.combine(fim + datetime.timedelta(days=1), datetime.time.min)
+    tarefa = None if tarefa == "Todas" else tarefa
+
+    resumo = resumo_por_tarefa(desde, ate)
+    if tarefa:
+        resumo = resumo[resumo["tarefa"] == tarefa]
+    if resumo.empty:
+        st.info("Nenhuma execução registrada no período.")
+        return
+
+    st.subheader("Resumo")
+    resumo = resumo.assign(
+        duracao_media=resumo["duracao_media"].round(1),
+        duracao_max=resumo["duracao_max"].round(1),
+        pico_rss_max=resumo["pico_rss_max"].map(_formatar_bytes),
+    )
+    st.dataframe(resumo.rename(columns={
+        "tarefa": "Tarefa", "execucoes": "Execuções", "falhas": "Falhas", "sem_fim": "Sem fim",
+        "duracao_media": "Duração média (s)", "duracao_max": "Duração máx. (s)",
+        "pico_rss_max": "Pico de memória", "ultima": "Última execução",
+    }), hide_index=True)
+
+    if tarefa:
+        diarias = duracoes_diarias(tarefa, desde, ate)
+        if not diarias.empty:
+            st.subheader("Duração por dia (s)")
+            st.line_chart(diarias.set_index("dia")[["duracao_total", "duracao_max"]])
+
+    st.subheader("Execuções")
+    execucoes = listar_execucoes(tarefa, desde, ate)
+    execucoes = execucoes.assign(
+        duracao=execucoes["duracao"].round(1),
+        bytes_saida=execucoes["bytes_saida"].map(_formatar_bytes),
+        pico_rss=execucoes["pico_rss"].map(_formatar_bytes),
+    )
+    st.dataframe(execucoes.drop(columns=["id"]).rename(columns={
+        "tarefa": "Tarefa", "gatilho": "Gatilho", "inicio": "Início", "fim": "Fim",
+        "duracao": "Duração (s)", "returncode": "Código", "bytes_saida": "Saída",
+        "pico_rss": "Pico de memória", "erro": "Erro",
+    }), hide_index=True)
@@ -9,6 +9,7 @@ from .scripts_manager import (
 )
 from .constants import LOG_DIRECTORY
 from .scheduler_manager import is_scheduler_running
+from .history_manager import historico
 from knowledge_manager import main as knowledge_main
 from chat.chat_app import main as chat_main
 from app.variavel_du import var_du as variavel_du
@@ -26,7 +27,7 @@ def main():
 
         option = st.sidebar.radio(
             "Escolha a página",
-            ("Chat", "Gerenciar Conhecimento", "Executar Scripts", "Configurar Scripts", "Monitoramento", "Variável D.U.")
+            ("Chat", "Gerenciar Conhecimento", "Executar Scripts", "Configurar Scripts", "Monitoramento", "Histórico", "Variável D.U.")
         )
 
         if option == "Chat":
@@ -41,6 +42,8 @@ def main():
             configurar_scripts()
         elif option == "Monitoramento":
             monitoramento()
+        elif option == "Histórico":
+            historico()
         elif option == "Variável D.U.":
             variavel_du()
     else:
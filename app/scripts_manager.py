@@ -1,12 +1,13 @@
 import os
-import json
 import sys
 import streamlit as st
 import subprocess
-from .constants import CONFIG_FILE
+from .constants import AVISO_CONFIG_EM_USO, CONFIG_FILE, ESPERA_CONFIG_MANUAL
 from functions.plan_gc import atualizar_plan_gc
 from functions.plan_faturamento import atualizar_faturamento
 from functions.fechamento_d0 import executar_fechamento_d0
+from utils.rotinas_config import ConfigEmUso, config_isolada
+from utils.run_history import Execucao, registrar_execucao
 
 from .config_manager import (
     carregar_configuracoes,
@@ -20,6 +21,12 @@ from .scheduler_manager import (
     parar_intermediador
 )
 
+# Nome no histórico de execuções (o mesmo das tarefas do scheduler)
+TAREFAS_HISTORICO = {
+    "main": "principal",
+    "030111": "criticas_rn",
+}
+
 def executar_scripts():
     """
     Página do Streamlit para executar scripts manualmente.
@@ -40,67 +47,74 @@ def executar_scripts():
     if st.button("Executar"):
         process = None
         log_lines = []
-        backup_config = None
+        tarefa = TAREFAS_HISTORICO.get(scripts[script_selecionado], scripts[script_selecionado])
 
         # 1) SE FOR "Atualizar Plan GC"
         if scripts[script_selecionado] == "atualizar_plan_gc":
             st.info("Executando atualização da planilha...")
-            atualizar_plan_gc()
+            with registrar_execucao(tarefa, "manual"):
+                atualizar_plan_gc()
             return
         
         # 2) SE FOR "Atualizar Faturamento"
         if scripts[script_selecionado] == "atualizar_faturamento":
             st.info("Executando atualização da planilha...")
-            atualizar_faturamento()
+            with registrar_execucao(tarefa, "manual"):
+                atualizar_faturamento()
             return
 
         # 3) SE FOR "Fechamento D-0"
         if scripts[script_selecionado] == "fechamento_d0":
             st.info("Executando Fechamento D-0...")
-            executar_fechamento_d0()
+            executar_fechamento_d0(tarefa)
             return
 
         # 4) DEMAIS SCRIPTS (Promax, Críticas RN, etc.)
+        execucao = None
+        bytes_saida = 0
+        erro_execucao = None
         try:
             st.info("Executando o script...")
             log_area = st.empty()
 
-            with st.spinner("Executando o script..."):
-                env = os.environ.copy()
+            # Críticas RN: só a rotina 030111 ativa, numa cópia do config
+            # desta execução (ROTINAS_CONFIG_PATH); ver utils/rotinas_config.py
+            # para o modo de compatibilidade com o rotinas_config.json
+            override = None
+            if scripts[script_selecionado] == "030111":
+                override = {"__all__": False, "030111": True}
+
+            with st.spinner("Executando o script..."), \
+                    config_isolada(CONFIG_FILE, override, timeout=ESPERA_CONFIG_MANUAL) as env:
+                # A duração no histórico conta a partir daqui, sem a espera
+                # pelo rotinas_config.json
+                execucao = Execucao(tarefa, "manual")
                 env["PYTHONIOENCODING"] = "utf-8"
 
                 script_to_run = os.path.abspath(
                     r"\\192.168.1.213\Administrativo\TecInfo\Automacoes\Guilherme\Promax\main.py"
                 )
 
-                # Faz backup do config atual para depois restaurar
-                with open(CONFIG_FILE, "r") as f:
-                    backup_config = json.load(f)
-
-                if scripts[script_selecionado] == "030111":
-                    # Override do config para rodar apenas "Críticas RN"
-                    config_override = {key: False for key in backup_config.keys()}
-                    config_override["030111"] = True
-                    with open(CONFIG_FILE, "w") as f:
-                        json.dump(config_override, f, indent=4)
-
                 process = subprocess.Popen(
                     [sys.executable, "-u", script_to_run],
                     stdout=subprocess.PIPE,
                     stderr=subprocess.PIPE,
                     env=env,
                 )
+                execucao.acompanhar(process)
 
                 while True:
                     output = process.stdout.readline()
                     if output == b"" and process.poll() is not None:
                         break
                     if output:
+                        bytes_saida += len(output)
                         decoded_output = output.decode('utf-8', errors='replace').strip()
                         log_lines.append(decoded_output)
                         log_area.text("\n".join(log_lines))
 
                 stderr = process.stderr.read()
+                bytes_saida += len(stderr)
                 if stderr.strip():
                     decoded_error = stderr.decode('utf-8', errors='replace')
                     log_lines.append(f"\n[ERRO] {decoded_error.strip()}")
@@ -112,19 +126,19 @@ def executar_scripts():
                 else:
                     st.error(f"O script terminou com erro. Código de saída: {process.returncode}")
 
+        except ConfigEmUso as e:
+            erro_execucao = f"{type(e).__name__}: {e}"
+            st.warning(AVISO_CONFIG_EM_USO)
         except Exception as e:
+            erro_execucao = f"{type(e).__name__}: {e}"
             st.error(f"Erro ao executar o script: {e}")
         finally:
-            # Restaura config se foi modificado
-            if backup_config:
-                with open(CONFIG_FILE, "w") as f:
-                    json.dump(backup_config, f, indent=4)
-                st.info("Configurações padrão restauradas.")
-
             # Se estiver ainda rodando, finaliza
             if process and process.poll() is None:
                 process.terminate()
                 process.wait()
+            if execucao is not None:
+                execucao.finalizar(process.returncode if process else None, bytes_saida, erro_execucao)
 
             log_lines.append("\nExecução finalizada.")
             if 'log_area' in locals():
@@ -0,0 +1,79 @@
+# bench_csv_cache.py
+#
+# Compara a leitura direta do CSV (pd.read_csv) com o cache Arrow de
+# utils/csv_cache.py: "frio" = primeira leitura (read_csv + grava o .arrow),
+# "quente" = leituras seguintes (só o .arrow, memory-map).
+#
+# Uso (na raiz do projeto):
+#   python benchmarks/bench_csv_cache.py
+#   python benchmarks/bench_csv_cache.py --linhas 10000 100000
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.csv_cache import carregar_csv, caminho_sidecar
+
+def gerar_csv(caminho: str, linhas: int):
+    """knowledge_base sintético com o mesmo formato (textos, R$, %, listas)."""
+    rng = np.random.default_rng(42)
+    ids = np.arange(linhas)
+    df = pd.DataFrame({
+        "categoria": np.where(ids % 3 == 0, "KPI", "Recurso"),
+        "subcategoria": [f"Sub {i % 50}" for i in ids],
+        "indicador": [f"Indicador {i}" for i in ids],
+        "meta": [f"R$ {v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".") for v in rng.uniform(1e3, 1e7, linhas)],
+        "real": rng.integers(0, 100000, linhas).astype(str),
+        "percentual_atual": [f"{v}%" for v in rng.integers(0, 120, linhas)],
+        "melhores_vendedores": [f"{i % 900} - Vendedor {i % 97}, {i % 700} - Vendedor {i % 53}" for i in ids],
+        "piores_vendedores": [f"{i % 800} - Vendedor {i % 89}" for i in ids],
+        "dias_faltantes": rng.integers(0, 30, linhas),
+        "data_atualizacao": "27/12/2024",
+        "fonte": "Promax",
+    })
+    df.to_csv(caminho, index=False, sep=";", encoding="ISO-8859-1")
+
+def medir(fn, repeticoes: int = 1) -> float:
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        fn()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do cache Arrow dos CSVs")
+    parser.add_argument("--linhas", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix="bench_csv_cache_")
+    try:
+        print(f"{'linhas':>10} {'MB csv':>8} {'read_csv':>10} {'frio':>10} {'quente':>10} {'ganho':>7}")
+        for linhas in args.linhas:
+            caminho = os.path.join(pasta, f"kb_{linhas}.csv")
+            gerar_csv(caminho, linhas)
+            tamanho_mb = os.path.getsize(caminho) / 1e6
+
+            t_csv = medir(lambda: pd.read_csv(caminho, delimiter=";", encoding="ISO-8859-1"), args.repeticoes)
+
+            def frio():
+                if os.path.exists(caminho_sidecar(caminho)):
+                    os.remove(caminho_sidecar(caminho))
+                carregar_csv(caminho)
+            t_frio = medir(frio, args.repeticoes)
+            t_quente = medir(lambda: carregar_csv(caminho), args.repeticoes)
+
+            print(f"{linhas:>10} {tamanho_mb:>8.1f} {t_csv:>9.3f}s {t_frio:>9.3f}s {t_quente:>9.3f}s {t_csv / t_quente:>6.1f}x")
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# bench_output_pump.py
+#
+# Custo de registrar a saída de um script "tagarela" (muitas linhas curtas):
+#   - base:   processo com stdout descartado (custo do próprio filho)
+#   - antigo: readline + registrar_log (abre/fecha o log por linha), como o
+#             executar_tarefa fazia, SEM o time.sleep(0.5) por linha (que
+#             sozinho somaria linhas * 0,5s; mostrado na coluna "sleep")
+#   - bomba:  utils/output_pump.py (thread lendo em blocos + log em lote)
+#
+# Uso (na raiz do projeto):
+#   python benchmarks/bench_output_pump.py
+#   python benchmarks/bench_output_pump.py --linhas 1000 100000
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.output_pump import LogBufferizado, bombear_saida
+
+FILHO = (
+    "import sys\n"
+    "for i in range(int(sys.argv[1])):\n"
+    "    print(f'linha {i}: processando registro {i % 997} do lote {i // 997} ... ok')\n"
+)
+
+def iniciar_filho(linhas: int, stdout):
+    return subprocess.Popen(
+        [sys.executable, "-u", "-c", FILHO, str(linhas)],
+        stdout=stdout,
+        stderr=subprocess.STDOUT,
+    )
+
+def base(linhas: int, caminho_log: str):
+    iniciar_filho(linhas, subprocess.DEVNULL).wait()
+
+def antigo(linhas: int, caminho_log: str):
+    proc = iniciar_filho(linhas, subprocess.PIPE)
+    while True:
+        linha = proc.stdout.readline()
+        if not linha:
+            break
+        data_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with open(caminho_log, "a", encoding="utf-8") as f:
+            f.write(f"[{data_str}] {linha.decode('utf-8', errors='replace').rstrip()}\n")
+    proc.wait()
+
+def bomba(linhas: int, caminho_log: str):
+    proc = iniciar_filho(linhas, subprocess.PIPE)
+    with LogBufferizado(caminho_log, eco=False) as log:
+        b = bombear_saida(proc, log)
+        proc.wait()
+        b.join()
+
+def medir(fn, linhas: int, caminho_log: str, repeticoes: int) -> float:
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        if os.path.exists(caminho_log):
+            os.remove(caminho_log)
+        inicio = time.perf_counter()
+        fn(linhas, caminho_log)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da leitura da saída dos scripts agendados")
+    parser.add_argument("--linhas", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix="bench_output_pump_")
+    caminho_log = os.path.join(pasta, "tarefa.log")
+    try:
+        print(f"{'linhas':>8} {'base':>9} {'antigo':>9} {'bomba':>9} {'overhead antigo':>16} {'overhead bomba':>15} {'sleep':>9}")
+        for linhas in args.linhas:
+            t_base = medir(base, linhas, caminho_log, args.repeticoes)
+            t_antigo = medir(antigo, linhas, caminho_log, args.repeticoes)
+            t_bomba = medir(bomba, linhas, caminho_log, args.repeticoes)
+            print(
+                f"{linhas:>8} {t_base:>8.3f}s {t_antigo:>8.3f}s {t_bomba:>8.3f}s "
+                f"{t_antigo - t_base:>15.3f}s {t_bomba - t_base:>14.3f}s {linhas * 0.5:>8.0f}s"
+            )
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
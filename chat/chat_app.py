@@ -1,7 +1,19 @@
+import time
 import streamlit as st
 
-from .loaders import load_csv, load_instructions
 from .core import generate_response
+from .store import get_store
+
+def _medir_stream(tokens, inicio: float):
+    """Repassa os tokens registrando, separadamente, a latência do 1º token e a total."""
+    primeiro = None
+    for token in tokens:
+        if primeiro is None:
+            primeiro = time.perf_counter() - inicio
+            print(f"[Chat] Primeiro token em {primeiro:.2f}s")
+        yield token
+    print(f"[Chat] Resposta completa em {time.perf_counter() - inicio:.2f}s "
+          f"(primeiro token em {primeiro or 0.0:.2f}s)")
 
 def main():
     st.title("Atendente Comercial")
@@ -10,8 +22,8 @@ def main():
     if "username" not in st.session_state:
         st.session_state.username = "Admin"
 
-    instructions_df = load_instructions()
-    knowledge_base_df = load_csv()
+    # Foto compartilhada (sem cópia por sessão) dos CSVs já convertidos e indexados
+    snapshot = get_store().snapshot()
 
     if "messages" not in st.session_state:
         st.session_state.messages = []
@@ -28,10 +40,17 @@ def main():
         st.session_state.messages.append({"role":"user","content":user_input})
         st.chat_message("user").write(user_input)
 
-        response = generate_response(user_input, knowledge_base_df, instructions_df)
+        inicio = time.perf_counter()
+        response = generate_response(user_input, snapshot.knowledge_base, snapshot.instructions)
+
+        if isinstance(response, str):
+            st.chat_message("assistant").markdown(response)
+            print(f"[Chat] Resposta completa em {time.perf_counter() - inicio:.2f}s")
+        else:
+            # Respostas do GPT chegam como gerador de tokens: renderiza aos poucos
+            response = st.chat_message("assistant").write_stream(_medir_stream(response, inicio))
 
         st.session_state.messages.append({"role":"assistant","content":response})
-        st.chat_message("assistant").markdown(response)
 
 if __name__=="__main__":
     main()
@@ -1,20 +1,26 @@
 import streamlit as st
 import pandas as pd
 
-from .utils import safe_to_float, format_currency, format_percentage
+from .utils import format_currency_valor, format_percentage_valor
+from utils import kb_backend
+from .kb_model import KnowledgeBaseModel, get_kb_model
+from .loaders import KB_PATH
 from .gpt import (
-    analyze_context_with_gpt,
     fallback_gpt_data,
     fallback_gpt_generic_category,
     generate_generic_response
 )
 from .matchers import (
+    get_matcher_index,
     handle_detail_level_choice,
     match_any_category,
     match_dados_local,
     match_any_item_in_category,
     match_kpi_recurso_local
 )
+from .topic import detectar_mudanca_topico
+from .llm_cache import stream_com_cache
+from .router import Etapa, rotear
 
 MONTH_NAMES = [
     "Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho",
@@ -29,114 +35,70 @@ def _format_int_thousands(num: float) -> str:
     val_int = int(round(num))  # Arredonda antes de converter para int
     return f"{val_int:,}".replace(",", ".")
 
-def _parse_faturamento_ano(real_str: str) -> list:
+def _tabela_faturamento(serie, titulo="Faturamento") -> str:
     """
-    Recebe a string com valores em pares (ex: "34040016,7399999,31044659,8699998,...").
-    Cada par corresponde a 1 mês: ex.: "34040016" e "7399999" => float(34040016.7399999).
-    Em seguida arredondamos para int e formatamos no estilo "34.040.016".
-
-    Retorna uma lista [(mes, valor_formatado), ...] com no máximo 12 meses.
-    """
-    parts = [p.strip() for p in real_str.split(",")]
-    paired_vals = []
-
-    for i in range(0, len(parts), 2):
-        if (i + 1) < len(parts):
-            # Há um "par" (parte_int + parte_dec)
-            parte_int = parts[i].replace(",", ".")   # ex: "34040016"
-            parte_dec = parts[i+1].replace(",", ".") # ex: "7399999"
-            try:
-                val = float(f"{parte_int}.{parte_dec}")  # 34040016.7399999
-            except ValueError:
-                val = 0.0
-            paired_vals.append(val)
-        else:
-            # Se sobrou só a parte_int
-            try:
-                val = float(parts[i].replace(",", "."))
-            except ValueError:
-                val = 0.0
-            paired_vals.append(val)
-
-    # Montar lista final com até 12 meses
-    results = []
-    max_months = min(len(paired_vals), 12)
-    for idx in range(max_months):
-        mes = MONTH_NAMES[idx]
-        val_str_formatted = _format_int_thousands(paired_vals[idx])
-        results.append((mes, val_str_formatted))
-    return results
-
-def _build_faturamento_table_generic(real_str: str, titulo="Faturamento") -> str:
-    """
-    Para Faturamento 2024 ou 2025: gera uma tabela com (Mês, Faturamento (R$)),
-    respeitando no máximo 12 pares de valores.
+    Tabela (Mês, Faturamento (R$)) a partir da série mensal já convertida no
+    KnowledgeBaseModel, com no máximo 12 meses.
     """
-    valores = _parse_faturamento_ano(real_str)
     txt = f"{titulo}:\nMês\tFaturamento (R$)\n"
-    for (mes, val) in valores:
-        txt += f"{mes}\t{val}\n"
+    for mes, val in zip(MONTH_NAMES, serie):
+        txt += f"{mes}\t{_format_int_thousands(val)}\n"
     return txt
 
-def _build_faturamento_table_2024_2025(real_str: str) -> str:
+def _build_faturamento_table_generic(series: list, titulo="Faturamento") -> str:
+    """Para Faturamento 2024 ou 2025: uma única série mensal."""
+    return _tabela_faturamento(series[0], titulo)
+
+def _build_faturamento_table_2024_2025(series: list) -> str:
     """
-    Para 'Faturamento 2024 x 2025', a string vem no formato:
-      "12589907,71,0,0,... / 34040016,7399999,31044659,8699998,..."
-    Construímos duas tabelas: primeira (2025) e depois (2024), cada uma com até 12 valores.
+    Para 'Faturamento 2024 x 2025' o real vem como "<2025> / <2024>":
+    construímos duas tabelas, primeiro 2025 e depois 2024.
     """
-    sides = [x.strip() for x in real_str.split("/")]
-    if len(sides) != 2:
+    if len(series) != 2:
         # Se não estiver no formato esperado, gera uma só
-        return _build_faturamento_table_generic(real_str, "Faturamento Desconhecido")
-
-    # Lado 1: 2025
-    tabela_2025 = _parse_faturamento_ano(sides[0])
-    txt_2025 = "Faturamento 2025:\nMês\tFaturamento (R$)\n"
-    for (mes, val) in tabela_2025:
-        txt_2025 += f"{mes}\t{val}\n"
-
-    # Lado 2: 2024
-    tabela_2024 = _parse_faturamento_ano(sides[1])
-    txt_2024 = "\nFaturamento 2024:\nMês\tFaturamento (R$)\n"
-    for (mes, val) in tabela_2024:
-        txt_2024 += f"{mes}\t{val}\n"
+        return _build_faturamento_table_generic(series, "Faturamento Desconhecido")
 
+    txt_2025 = _tabela_faturamento(series[0], "Faturamento 2025")
+    txt_2024 = _tabela_faturamento(series[1], "\nFaturamento 2024")
     return txt_2025 + "\n" + txt_2024
 
+def _buscar_registro(knowledge_base: pd.DataFrame, cat, kpi):
+    """
+    RegistroKB do indicador: no SQLite, a linha vem do índice do banco
+    (kb_backend.buscar); no CSV, do KnowledgeBaseModel em memória.
+    """
+    if kb_backend.usa_sqlite():
+        linha = kb_backend.buscar(KB_PATH, cat, kpi)
+        return KnowledgeBaseModel(pd.DataFrame([linha])).registro(0) if linha else None
+    modelo = get_kb_model(knowledge_base)
+    pos = modelo.buscar(cat, kpi)
+    return modelo.registro(pos) if pos is not None else None
+
 def generate_final_response(knowledge_base: pd.DataFrame, instructions_df: pd.DataFrame):
     cat = st.session_state.current_category
     kpi = st.session_state.current_kpi
     detail = st.session_state.detail_level
     username = st.session_state.get("username","USUARIO")
 
-    df = knowledge_base[
-        (knowledge_base["categoria"].str.lower()==cat.lower()) &
-        (knowledge_base["indicador"].str.lower()==kpi.lower())
-    ]
-    if df.empty:
+    row = _buscar_registro(knowledge_base, cat, kpi)
+    if row is None:
         st.session_state.detail_level = None
         return "Não encontrei dados para esse indicador/recurso na base."
 
-    row = df.iloc[0]
-    instr_df = instructions_df[
-        (instructions_df["categoria"].str.lower()==cat.lower()) &
-        (instructions_df["nome_coluna"].str.lower()==kpi.lower())
-    ]
-    if instr_df.empty:
-        instr_df = instructions_df[instructions_df["categoria"].str.lower()==cat.lower()]
-    irow = instr_df.iloc[0]
-
-    meta = row.get("meta","")
-    real = row.get("real","")
-    perc = row.get("percentual_atual","")
-    best_sellers = row.get("melhores_vendedores","")
-    worst_sellers = row.get("piores_vendedores","")
-    dias_falt = row.get("dias_faltantes","")
-    data_upd = row.get("data_atualizacao","")
-    indicator_name = row.get("indicador","")
-
-    desc = irow.get("descricao","")
-    strategy = irow.get("estrategia_resposta","")
+    index = get_matcher_index(instructions_df)
+    ipos = index.linha_instrucao(cat, kpi)
+
+    meta = row.meta_bruta
+    real = row.real_bruto
+    perc = row.percentual_bruto
+    best_sellers = ", ".join(row.melhores_vendedores)
+    worst_sellers = ", ".join(row.piores_vendedores)
+    dias_falt = row.dias_faltantes_bruto
+    data_upd = row.data_atualizacao
+    indicator_name = row.indicador
+
+    desc = index.descricoes[ipos] if ipos is not None else ""
+    strategy = index.estrategias[ipos] if ipos is not None else ""
 
     is_fat_2024 = (indicator_name.lower() == "faturamento 2024")
     is_fat_2025 = (indicator_name.lower() == "faturamento 2025")
@@ -144,16 +106,14 @@ def generate_final_response(knowledge_base: pd.DataFrame, instructions_df: pd.Da
 
     if detail == "Detalhado":
         st.session_state.detail_level = None
-        from langchain_openai import ChatOpenAI
-        llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.7, max_tokens=1000)
 
         # Se Faturamento 2024, 2025 ou 2024 x 2025, gera tabela customizada
-        if (is_fat_2024 or is_fat_2025 or is_fat_24x25) and isinstance(real, str):
+        if (is_fat_2024 or is_fat_2025 or is_fat_24x25) and row.faturamento_mensal:
             if is_fat_24x25:
-                tabelas = _build_faturamento_table_2024_2025(real)
+                tabelas = _build_faturamento_table_2024_2025(row.faturamento_mensal)
             else:
                 ano = indicator_name[-4:].strip()  # ex.: "2024"
-                tabelas = _build_faturamento_table_generic(real, f"Faturamento {ano}")
+                tabelas = _build_faturamento_table_generic(row.faturamento_mensal, f"Faturamento {ano}")
             extra_table_info = tabelas
         else:
             extra_table_info = ""
@@ -195,29 +155,32 @@ def generate_final_response(knowledge_base: pd.DataFrame, instructions_df: pd.Da
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt}
         ]
-        return llm.invoke(msgs).content.strip()
+        # Mesma pergunta + mesmos dados => resposta do cache (invalida quando
+        # a data_atualizacao da linha muda). Devolve um gerador de tokens.
+        return stream_com_cache(
+            msgs,
+            versao=str(data_upd),
+            username=username,
+            model="gpt-4o-mini", temperature=0.7, max_tokens=1000
+        )
 
     else:
         # Modo Resumido
         st.session_state.detail_level = None
         if cat.lower() == "kpi":
-            val_meta = safe_to_float(meta)
-            val_real = safe_to_float(real)
-            faltam = None
-            if val_meta is not None and val_real is not None:
-                faltam = val_meta - val_real
+            faltam = row.meta - row.real  # NaN se algum dos dois não for número
 
             text = f"""
             **{indicator_name}** (KPI)
 
-            - Meta: {format_currency(meta)}
-            - Real: {format_currency(real)}
-            - Percentual: {format_percentage(perc)}
+            - Meta: {format_currency_valor(row.meta, meta)}
+            - Real: {format_currency_valor(row.real, real)}
+            - Percentual: {format_percentage_valor(row.percentual, perc)}
             - Melhores Vendedores: {best_sellers}
             - Piores Vendedores: {worst_sellers}
             """
-            if faltam is not None:
-                text += f"- Faltam {format_currency(str(faltam))} para a meta, com {dias_falt} dias restantes.\n"
+            if faltam == faltam:
+                text += f"- Faltam {format_currency_valor(faltam)} para a meta, com {dias_falt} dias restantes.\n"
             else:
                 text += f"- Dias Restantes: {dias_falt}\n"
             text += f"- Última Atualização: {data_upd}"
@@ -228,9 +191,9 @@ def generate_final_response(knowledge_base: pd.DataFrame, instructions_df: pd.Da
             text = f"""
             **{indicator_name}** (Recurso)
 
-            - Recurso Disponível: {format_currency(meta)}
-            - Recurso Utilizado: {format_currency(real)}
-            - Percentual Utilizado: {format_percentage(perc)}
+            - Recurso Disponível: {format_currency_valor(row.meta, meta)}
+            - Recurso Utilizado: {format_currency_valor(row.real, real)}
+            - Percentual Utilizado: {format_percentage_valor(row.percentual, perc)}
             - Última atualização: {data_upd}
             """
             return text.strip()
@@ -239,6 +202,9 @@ def generate_response(user_input: str, knowledge_base: pd.DataFrame, instruction
     """
     Fluxo principal. No modo Detalhado, agora exibimos a tabela
     com valores full int formatados em grupos de mil, ex.: '34.040.016'.
+
+    Retorna uma str ou, nos caminhos que chamam o GPT, um gerador de tokens
+    (o chat_app renderiza com st.write_stream).
     """
     if "current_category" not in st.session_state:
         st.session_state.current_category = None
@@ -257,8 +223,8 @@ def generate_response(user_input: str, knowledge_base: pd.DataFrame, instruction
         "username": username
     }
 
-    # Detectar "novo tópico"
-    is_new_topic, gpt_feedback = analyze_context_with_gpt(
+    # Detectar "novo tópico" (regras locais; o LLM só é chamado se for ambíguo)
+    is_new_topic, gpt_feedback = detectar_mudanca_topico(
         user_input, current_context, instructions_df, username=username
     )
     st.write(f"**[Insight do Sônico]:** {gpt_feedback}")
@@ -282,18 +248,80 @@ def generate_response(user_input: str, knowledge_base: pd.DataFrame, instruction
         st.session_state.detail_level = detail_choice
         return generate_final_response(knowledge_base, instructions_df)
 
+    # Roteamento: as etapas locais e os fallbacks de GPT são avaliados em
+    # ordem de prioridade e vale a primeira aceita; o GPT só é chamado se as
+    # etapas locais não resolverem (ver chat/router.py). A categoria atual
+    # não muda até o fim do roteamento.
+    current_category = st.session_state.current_category
+    current_lower = (current_category or "").lower()
+    etapas = []
+
     # Se ainda não temos category, tenta match_kpi_recurso_local
-    if st.session_state.current_category is None:
-        local_cat, local_name, local_score = match_kpi_recurso_local(user_input_lower, instructions_df)
-        if local_score >= 70 and local_cat and local_name:
-            st.session_state.current_category = local_cat
-            st.session_state.current_kpi = local_name
-            st.session_state.detail_level = None
-            return "Você gostaria de um nível de detalhe 'detalhado' ou 'resumido'?"
+    if current_category is None:
+        etapas.append(Etapa(
+            "kpi_local",
+            lambda: match_kpi_recurso_local(user_input_lower, instructions_df),
+            lambda r: r[2] >= 70 and r[0] and r[1]
+        ))
 
     # Tenta reconhecer se user escolheu nova categoria
-    cat_guess = match_any_category(user_input_lower, instructions_df)
-    if cat_guess and cat_guess.lower() != (st.session_state.current_category or "").lower():
+    etapas.append(Etapa(
+        "categoria",
+        lambda: match_any_category(user_input_lower, instructions_df),
+        lambda r: r and r.lower() != current_lower
+    ))
+
+    # Tenta "dados" local e fallback GPT p/ "dados"
+    etapas.append(Etapa(
+        "dados_local",
+        lambda: match_dados_local(user_input_lower, instructions_df),
+        lambda r: r[3] >= 70
+    ))
+    etapas.append(Etapa(
+        "dados_gpt",
+        lambda: fallback_gpt_data(user_input, instructions_df, username=username),
+        lambda r: r[0] and r[1] and r[2],
+        especulativa=True
+    ))
+
+    # Se a current_category for kpi/recurso e user especifica item
+    if current_category and current_lower in ["kpi","recurso"]:
+        etapas.append(Etapa(
+            "kpi_local",
+            lambda: match_kpi_recurso_local(user_input_lower, instructions_df),
+            lambda r: r[2] >= 70
+        ))
+        etapas.append(Etapa(
+            "kpi_gpt",
+            lambda: fallback_gpt_generic_category(current_category, user_input, instructions_df, username=username),
+            lambda r: r[0] and r[1],
+            especulativa=True
+        ))
+
+    # Se a current_category for genérica
+    if current_category and current_lower not in ["kpi","recurso","dados"]:
+        etapas.append(Etapa(
+            "item_local",
+            lambda: match_any_item_in_category(current_category, user_input_lower, instructions_df),
+            lambda r: r[3] >= 70
+        ))
+        etapas.append(Etapa(
+            "item_gpt",
+            lambda: fallback_gpt_generic_category(current_category, user_input, instructions_df, username=username),
+            lambda r: r[0] and r[1] and r[2],
+            especulativa=True
+        ))
+
+    etapa, resultado = rotear(etapas)
+
+    if etapa in ["kpi_local", "kpi_gpt"]:
+        st.session_state.current_category = resultado[0]
+        st.session_state.current_kpi = resultado[1]
+        st.session_state.detail_level = None
+        return "Você gostaria de um nível de detalhe 'detalhado' ou 'resumido'?"
+
+    if etapa == "categoria":
+        cat_guess = resultado
         st.session_state.current_category = cat_guess
         st.session_state.current_kpi = None
         st.session_state.detail_level = None
@@ -307,58 +335,9 @@ def generate_response(user_input: str, knowledge_base: pd.DataFrame, instruction
         else:
             return f"OK, categoria={cat_guess}, mas não achei indicadores."
 
-    # Tenta "dados" local
-    dados_nome, dados_desc, dados_strat, dados_score = match_dados_local(user_input_lower, instructions_df)
-    if dados_score >= 70:
-        return generate_generic_response(dados_nome, dados_desc, dados_strat, username=username)
-
-    # fallback GPT p/ "dados"
-    fb_nm, fb_desc, fb_strat = fallback_gpt_data(user_input, instructions_df, username=username)
-    if fb_nm and fb_desc and fb_strat:
-        return generate_generic_response(fb_nm, fb_desc, fb_strat, username=username)
-
-    # Se a current_category for kpi/recurso e user especifica item
-    if (st.session_state.current_category
-        and st.session_state.current_category.lower() in ["kpi","recurso"]):
-        local_cat, local_name, local_score = match_kpi_recurso_local(user_input_lower, instructions_df)
-        if local_score >= 70:
-            st.session_state.current_category = local_cat
-            st.session_state.current_kpi = local_name
-            st.session_state.detail_level = None
-            return "Você gostaria de um nível de detalhe 'detalhado' ou 'resumido'?"
-
-        # fallback GPT p/ KPI/Recurso
-        cat_gpt, nm_gpt, fb_desc, fb_score = fallback_gpt_generic_category(
-            st.session_state.current_category,
-            user_input,
-            instructions_df,
-            username=username
-        )
-        if cat_gpt and nm_gpt:
-            st.session_state.current_category = cat_gpt
-            st.session_state.current_kpi = nm_gpt
-            st.session_state.detail_level = None
-            return "Você gostaria de um nível de detalhe 'detalhado' ou 'resumido'?"
-
-    # Se a current_category for genérica
-    if (st.session_state.current_category
-        and st.session_state.current_category.lower() not in ["kpi","recurso","dados"]):
-        gen_nm, gen_desc, gen_strat, gen_score = match_any_item_in_category(
-            st.session_state.current_category,
-            user_input_lower,
-            instructions_df
-        )
-        if gen_score>=70:
-            return generate_generic_response(gen_nm, gen_desc, gen_strat, username=username)
-
-        fb_gen_nm, fb_gen_desc, fb_gen_strat, _ = fallback_gpt_generic_category(
-            st.session_state.current_category,
-            user_input,
-            instructions_df,
-            username=username
-        )
-        if fb_gen_nm and fb_gen_desc and fb_gen_strat:
-            return generate_generic_response(fb_gen_nm, fb_gen_desc, fb_gen_strat, username=username)
+    if etapa in ["dados_local", "dados_gpt", "item_local", "item_gpt"]:
+        nome, desc, strat = resultado[:3]
+        return generate_generic_response(nome, desc, strat, username=username)
 
     # Nada encontrado => listar categorias
     all_cats = instructions_df["categoria"].dropna().unique()
@@ -0,0 +1,164 @@
+import os
+import glob
+import hashlib
+import threading
+import weakref
+import zlib
+
+import numpy as np
+
+from .utils import remove_punct_lower
+
+try:
+    import faiss
+except ImportError:  # sem faiss, a busca cai no produto interno em NumPy
+    faiss = None
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INDEX_DIR = os.path.join(BASE_DIR, ".cache")
+
+# Similaridade (cosseno, 0-1) mínima para aceitar a linha sem chamar o GPT
+EMBEDDING_CUTOFF = float(os.getenv("EMBEDDING_CUTOFF", "0.40"))
+EMBEDDING_DIM = 1024
+
+def embedding_hash_ngramas(textos: list) -> np.ndarray:
+    """
+    Embedding local padrão: "hashing trick" sobre palavras e trigramas de
+    caracteres, com peso sublinear e normalização L2. Não depende de modelo
+    nem de rede. Usa crc32 (estável entre processos) para o índice em disco.
+    """
+    matriz = np.zeros((len(textos), EMBEDDING_DIM), dtype=np.float32)
+    for i, texto in enumerate(textos):
+        texto = remove_punct_lower(texto or "")
+        for palavra in texto.split():
+            matriz[i, zlib.crc32(palavra.encode("utf-8")) % EMBEDDING_DIM] += 2.0
+            palavra = f" {palavra} "
+            for j in range(len(palavra) - 2):
+                grama = palavra[j:j + 3].encode("utf-8")
+                matriz[i, zlib.crc32(grama) % EMBEDDING_DIM] += 1.0
+    np.log1p(matriz, out=matriz)
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    normas[normas == 0] = 1.0
+    return matriz / normas
+
+_embedding_fn = embedding_hash_ngramas
+_embedding_nome = "hash_ngramas_v1"
+
+def set_embedding_function(fn, nome: str):
+    """
+    Troca a função de embedding (lista de textos -> matriz float32 normalizada).
+    O 'nome' entra na chave do índice em disco, então trocar a função força
+    a reconstrução.
+    """
+    global _embedding_fn, _embedding_nome
+    _embedding_fn = fn
+    _embedding_nome = nome
+    with _LOCK:
+        _CACHE.clear()
+
+def _texto_linha(index, pos: int) -> str:
+    """O que representa a linha no embedding: nome, sinônimos e descrição."""
+    return " ".join([index.nomes[pos]] + index.sinonimos[pos] + [index.descricoes[pos]])
+
+class InstructionEmbeddingIndex:
+    """
+    Índice FAISS (produto interno = cosseno) sobre as linhas do instructions.csv.
+
+    Fica salvo em .cache/ com o hash do conteúdo + nome da função de embedding
+    no nome do arquivo; só é reconstruído quando o CSV (ou a função) muda.
+    """
+
+    def __init__(self, matcher_index):
+        # Só o mapa de categorias: guardar o MatcherIndex impediria o
+        # WeakKeyDictionary de liberar versões antigas
+        self.total = len(matcher_index)
+        self.por_categoria = matcher_index.por_categoria
+        textos = [_texto_linha(matcher_index, pos) for pos in range(len(matcher_index))]
+
+        digest = hashlib.sha1(_embedding_nome.encode("utf-8"))
+        for texto, cat in zip(textos, matcher_index.categorias):
+            digest.update(f"{cat}\x1f{texto}\x1e".encode("utf-8"))
+        self.chave = digest.hexdigest()[:16]
+
+        self.faiss_index = None
+        self.matriz = None
+        if faiss is not None:
+            self.faiss_index = self._carregar_ou_construir(textos)
+        elif textos:
+            self.matriz = _embedding_fn(textos)
+
+    def _carregar_ou_construir(self, textos: list):
+        caminho = os.path.join(INDEX_DIR, f"instructions_{self.chave}.faiss")
+        if os.path.exists(caminho):
+            try:
+                return faiss.read_index(caminho)
+            except RuntimeError:
+                pass  # arquivo corrompido: reconstrói abaixo
+
+        index = faiss.IndexFlatIP(EMBEDDING_DIM)
+        if textos:
+            index.add(np.ascontiguousarray(_embedding_fn(textos), dtype=np.float32))
+
+        try:
+            os.makedirs(INDEX_DIR, exist_ok=True)
+            tmp = f"{caminho}.{os.getpid()}.tmp"
+            faiss.write_index(index, tmp)
+            os.replace(tmp, caminho)
+            for antigo in glob.glob(os.path.join(INDEX_DIR, "instructions_*.faiss")):
+                if antigo != caminho:
+                    os.remove(antigo)
+        except OSError:
+            pass  # sem permissão de escrita: segue só com o índice em memória
+        return index
+
+    def buscar(self, question: str, categorias=None, k: int = 5) -> list:
+        """
+        Retorna até k pares (linha, similaridade) mais próximos da pergunta,
+        opcionalmente restritos às categorias informadas.
+        """
+        if categorias is None:
+            posicoes = list(range(self.total))
+        else:
+            posicoes = sorted(p for cat in categorias for p in self.por_categoria.get(cat.lower(), []))
+        if not posicoes:
+            return []
+        k = min(k, len(posicoes))
+        consulta = np.ascontiguousarray(_embedding_fn([question]), dtype=np.float32)
+
+        if self.faiss_index is not None:
+            params = None
+            if categorias is not None:
+                seletor = faiss.IDSelectorBatch(np.asarray(posicoes, dtype=np.int64))
+                params = faiss.SearchParameters(sel=seletor)
+            scores, linhas = self.faiss_index.search(consulta, k, params=params)
+            return [(int(l), float(s)) for l, s in zip(linhas[0], scores[0]) if l >= 0]
+
+        scores = self.matriz[posicoes] @ consulta[0]
+        melhores = np.argsort(-scores, kind="stable")[:k]
+        return [(posicoes[i], float(scores[i])) for i in melhores]
+
+_CACHE = weakref.WeakKeyDictionary()
+_LOCK = threading.Lock()
+
+def get_embedding_index(matcher_index) -> InstructionEmbeddingIndex:
+    """Um InstructionEmbeddingIndex por MatcherIndex (ou seja, por versão do CSV)."""
+    with _LOCK:
+        index = _CACHE.get(matcher_index)
+        if index is None:
+            index = InstructionEmbeddingIndex(matcher_index)
+            _CACHE[matcher_index] = index
+    return index
+
+def melhor_linha(question: str, matcher_index, categorias=None, cutoff: float = None):
+    """
+    Linha mais parecida com a pergunta e sua similaridade, ou (None, score)
+    quando o melhor resultado fica abaixo do cutoff (EMBEDDING_CUTOFF por padrão).
+    """
+    cutoff = EMBEDDING_CUTOFF if cutoff is None else cutoff
+    resultados = get_embedding_index(matcher_index).buscar(question, categorias, k=1)
+    if not resultados:
+        return None, 0.0
+    pos, score = resultados[0]
+    if score < cutoff:
+        return None, score
+    return pos, score
@@ -1,9 +1,13 @@
 import json
 import streamlit as st
-from langchain_openai import ChatOpenAI
+
+from .embeddings import melhor_linha
+from .matchers import get_matcher_index
+from .llm import get_llm
+from .llm_cache import stream_com_cache
 
 def analyze_context_with_gpt(user_input, current_context, instructions_df, username="USUARIO"):
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.7, max_tokens=1000)
+    llm = get_llm(model="gpt-4o-mini", temperature=0.7, max_tokens=1000)
     system_prompt = f"""
     Você é um assistente que detecta mudança de assunto.
     O usuário se chama {username}.
@@ -19,10 +23,17 @@ def analyze_context_with_gpt(user_input, current_context, instructions_df, usern
     return False, "Continuando no mesmo fluxo."
 
 def fallback_gpt_data(question: str, instructions_df, username="USUARIO"):
-    df_dados = instructions_df[instructions_df["categoria"].str.lower()=="dados"]
-    if df_dados.empty:
+    index = get_matcher_index(instructions_df)
+    if not index.posicoes(["dados"]):
         return None, None, None
 
+    # Índice de embeddings local: só vai ao GPT se a similaridade for baixa
+    pos, _ = melhor_linha(question, index, ["dados"])
+    if pos is not None:
+        return index.nomes[pos], index.descricoes[pos], index.estrategias[pos]
+
+    df_dados = instructions_df[instructions_df["categoria"].str.lower()=="dados"]
+
     knowledge_list = []
     for _, row in df_dados.iterrows():
         nome = row.get("nome_coluna","")
@@ -36,7 +47,7 @@ def fallback_gpt_data(question: str, instructions_df, username="USUARIO"):
             "sinonimos": syns
         })
 
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.7, max_tokens=1000)
+    llm = get_llm(model="gpt-4o-mini", temperature=0.7, max_tokens=1000)
     system_prompt = f"""
     Você é um assistente que recebe uma lista de 'Dados'.
     O usuário se chama {username}.
@@ -61,10 +72,16 @@ def fallback_gpt_data(question: str, instructions_df, username="USUARIO"):
         return None,None,None
 
 def fallback_gpt_generic_category(category: str, question: str, instructions_df, username="USUARIO"):
-    df_cat = instructions_df[instructions_df["categoria"].str.lower() == category.lower()]
-    if df_cat.empty:
+    index = get_matcher_index(instructions_df)
+    if not index.posicoes([category]):
         return None, None, None, 0
 
+    pos, score = melhor_linha(question, index, [category])
+    if pos is not None:
+        return category, index.nomes[pos], index.descricoes[pos], score
+
+    df_cat = instructions_df[instructions_df["categoria"].str.lower() == category.lower()]
+
     knowledge_list = []
     for _, row in df_cat.iterrows():
         nm = row.get("nome_coluna", "")
@@ -78,7 +95,7 @@ def fallback_gpt_generic_category(category: str, question: str, instructions_df,
             "sinonimos": syns
         })
 
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.7, max_tokens=1000)
+    llm = get_llm(model="gpt-4o-mini", temperature=0.7, max_tokens=1000)
     system_prompt = f"""
     Você é um assistente que recebe uma lista de itens da categoria '{category}'.
     O usuário se chama {username}.
@@ -103,8 +120,8 @@ def fallback_gpt_generic_category(category: str, question: str, instructions_df,
     except:
         return None, None, None, 0
 
-def generate_generic_response(nome: str, desc: str, strat: str, username="USUARIO") -> str:
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.9, max_tokens=1000)
+def generate_generic_response(nome: str, desc: str, strat: str, username="USUARIO"):
+    """Gera a resposta em streaming (gerador de tokens) para o st.write_stream."""
     system_prompt = f"Você é um assistente criativo. O usuário se chama {username}."
     user_prompt = f"""
     O usuário busca informação sobre '{nome}'.
@@ -119,5 +136,6 @@ def generate_generic_response(nome: str, desc: str, strat: str, username="USUARI
         {"role":"system","content":system_prompt},
         {"role":"user","content":user_prompt}
     ]
-    response = llm.invoke(msgs).content.strip()
-    return response
+    return stream_com_cache(
+        msgs, username=username, model="gpt-4o-mini", temperature=0.9, max_tokens=1000
+    )
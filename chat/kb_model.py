@@ -0,0 +1,223 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from .utils import CachePorDataFrame
+
+COLUNAS_KB = [
+    "categoria", "subcategoria", "indicador", "meta", "real", "percentual_atual",
+    "melhores_vendedores", "piores_vendedores", "dias_faltantes", "data_atualizacao", "fonte"
+]
+
+# "31.044.660" ou "1.195.352": ponto como separador de milhar (padrão BR)
+_MILHAR_BR = re.compile(r"^-?\d{1,3}(\.\d{3})+$")
+
+def _texto(valor) -> str:
+    """Converte células do CSV para str, tratando None/NaN como vazio."""
+    if valor is None:
+        return ""
+    if isinstance(valor, float) and valor != valor:
+        return ""
+    return str(valor).strip()
+
+def parse_numero(s) -> float:
+    """
+    Converte valores do knowledge_base para float, ou NaN se não for número.
+    Aceita "R$ 31.044.660,00", "36837", "0,721753361", "24%" e "34040016.73".
+    """
+    s = _texto(s).replace("R$", "").replace("%", "").replace(" ", "")
+    if not s:
+        return np.nan
+    if "," in s:
+        s = s.replace(".", "").replace(",", ".")
+    elif _MILHAR_BR.match(s):
+        s = s.replace(".", "")
+    try:
+        return float(s)
+    except ValueError:
+        return np.nan
+
+def parse_percentual(s) -> float:
+    """
+    Percentual em pontos (0-100+). Com '%' o número já está em pontos
+    ("24%" => 24); sem '%' é o valor bruto do Excel, sempre fração
+    ("0,721753361" => 72.18, "1" => 100, "2" => 200).
+    """
+    valor = parse_numero(s)
+    if np.isnan(valor) or "%" in _texto(s):
+        return valor
+    return valor * 100
+
+MESES = 12
+
+def _custo_mes(inteiro: str, decimal: str, digitos_ref: int) -> int:
+    """
+    Penalidade de ler 'inteiro[,decimal]' como um mês. O Excel não escreve
+    zeros à direita nos decimais nem decimais num mês zerado, e os meses com
+    faturamento têm a mesma ordem de grandeza: cada regra violada custa 1.
+    """
+    custo = 0
+    if decimal is not None:
+        custo += decimal.endswith("0")
+        custo += inteiro.lstrip("-") == "0"
+    if inteiro.lstrip("-") != "0" and len(inteiro.lstrip("-")) < digitos_ref - 2:
+        custo += 1
+    return custo
+
+def _dividir_meses(partes: list) -> list:
+    """
+    Agrupa as partes de "12589907,71,0,..." em exatamente 12 meses (valores
+    com ou sem decimais). São len(partes) - 12 decimais; entre as divisões
+    possíveis fica a de menor _custo_mes (empate: a que junta mais cedo).
+    """
+    n = len(partes)
+    digitos_ref = max(len(p.lstrip("-")) for p in partes)
+    # melhor[i][m]: (custo, meses) para ler partes[i:] como m meses
+    melhor = [[None] * (MESES + 1) for _ in range(n + 2)]
+    melhor[n][0] = (0, [])
+    for i in range(n - 1, -1, -1):
+        for m in range(1, MESES + 1):
+            opcoes = []
+            if i + 1 < n and melhor[i + 2][m - 1] is not None:
+                custo, resto = melhor[i + 2][m - 1]
+                opcoes.append((custo + _custo_mes(partes[i], partes[i + 1], digitos_ref),
+                               [f"{partes[i]},{partes[i + 1]}"] + resto))
+            if melhor[i + 1][m - 1] is not None:
+                custo, resto = melhor[i + 1][m - 1]
+                opcoes.append((custo + _custo_mes(partes[i], None, digitos_ref), [partes[i]] + resto))
+            if opcoes:
+                melhor[i][m] = min(opcoes, key=lambda o: o[0])
+    return melhor[0][MESES][1]
+
+def parse_serie_mensal(s: str) -> np.ndarray:
+    """
+    Série de faturamento de um ano (12 meses) em float.
+
+    Dois formatos aparecem no CSV:
+      - "R$ 34.040.017;R$ 31.044.660;..." (um valor monetário por mês)
+      - "12589907,71,0,0,..." (inteiro e decimais separados pela mesma vírgula)
+    No segundo, o número de decimais sai do layout fixo de 12 meses (partes
+    além de 12 são decimais) e a posição deles de _dividir_meses. Fora
+    desse layout (menos de 12 ou mais de 24 partes) cada parte é um mês.
+    """
+    s = _texto(s)
+    if ";" in s:
+        valores = [parse_numero(p) for p in s.split(";") if p.strip()]
+        return np.nan_to_num(np.array(valores[:MESES], dtype=float))
+
+    partes = [p.strip() for p in s.split(",") if p.strip()]
+    if MESES <= len(partes) <= 2 * MESES:
+        meses = _dividir_meses(partes)
+    else:
+        meses = partes[:MESES]
+    valores = [parse_numero(m) for m in meses]
+    return np.nan_to_num(np.array(valores, dtype=float))
+
+def parse_faturamento(s: str) -> list:
+    """
+    Lista de séries mensais (np.ndarray) da célula 'real'. No indicador
+    "Faturamento 2024 x 2025" vêm duas séries separadas por '/': 2025 e 2024.
+    """
+    return [parse_serie_mensal(lado) for lado in _texto(s).split("/")]
+
+def parse_vendedores(s) -> list:
+    """'257 - Wellington , 159 - Paulo' => ['257 - Wellington', '159 - Paulo']."""
+    return [v.strip() for v in _texto(s).split(",") if v.strip()]
+
+def _eh_faturamento(indicador: str) -> bool:
+    indicador = indicador.lower()
+    return indicador in ("faturamento 2024", "faturamento 2025") or "2024 x 2025" in indicador
+
+class RegistroKB:
+    """Uma linha do knowledge_base já convertida (visão sobre o KnowledgeBaseModel)."""
+
+    def __init__(self, modelo, pos: int):
+        self.pos = pos
+        self.categoria = modelo.categoria[pos]
+        self.subcategoria = modelo.subcategoria[pos]
+        self.indicador = modelo.indicador[pos]
+        self.meta = float(modelo.meta[pos])
+        self.real = float(modelo.real[pos])
+        self.percentual = float(modelo.percentual[pos])
+        self.dias_faltantes = float(modelo.dias_faltantes[pos])
+        self.faturamento_mensal = modelo.faturamento_mensal[pos]
+        self.melhores_vendedores = modelo.melhores_vendedores[pos]
+        self.piores_vendedores = modelo.piores_vendedores[pos]
+        self.data_atualizacao = modelo.data_atualizacao[pos]
+        self.fonte = modelo.fonte[pos]
+        # Textos originais, usados no prompt e quando o valor não é numérico
+        self.meta_bruta = modelo.meta_bruta[pos]
+        self.real_bruto = modelo.real_bruto[pos]
+        self.percentual_bruto = modelo.percentual_bruto[pos]
+        self.dias_faltantes_bruto = modelo.dias_faltantes_bruto[pos]
+
+class KnowledgeBaseModel:
+    """
+    knowledge_base.csv convertido uma única vez, no carregamento, em colunas
+    tipadas: meta/real/percentual/dias como arrays float (NaN quando o texto
+    não é número), a série mensal de faturamento já separada em float e as
+    listas de vendedores. As respostas do chat leem daqui em vez de
+    reinterpretar as strings a cada pergunta.
+    """
+
+    def __init__(self, knowledge_base: pd.DataFrame):
+        for col in COLUNAS_KB:
+            if col not in knowledge_base.columns:
+                knowledge_base = knowledge_base.assign(**{col: None})
+
+        def coluna(nome):
+            return [_texto(v) for v in knowledge_base[nome].tolist()]
+
+        self.categoria = coluna("categoria")
+        self.subcategoria = coluna("subcategoria")
+        self.indicador = coluna("indicador")
+        self.data_atualizacao = coluna("data_atualizacao")
+        self.fonte = coluna("fonte")
+        self.meta_bruta = coluna("meta")
+        self.real_bruto = coluna("real")
+        self.percentual_bruto = coluna("percentual_atual")
+        self.dias_faltantes_bruto = coluna("dias_faltantes")
+
+        self.meta = np.array([parse_numero(v) for v in self.meta_bruta], dtype=float)
+        self.percentual = np.array([parse_percentual(v) for v in self.percentual_bruto], dtype=float)
+        self.dias_faltantes = np.array([parse_numero(v) for v in self.dias_faltantes_bruto], dtype=float)
+
+        # Nos indicadores de faturamento o 'real' é a série mensal (em
+        # faturamento_mensal); 'real' fica NaN, como qualquer texto que não é
+        # um número, para o resumo mostrar o texto original e os dias restantes
+        self.faturamento_mensal = []
+        reais = []
+        for indicador, real in zip(self.indicador, self.real_bruto):
+            if _eh_faturamento(indicador):
+                series = parse_faturamento(real)
+                self.faturamento_mensal.append(series)
+                reais.append(np.nan)
+            else:
+                self.faturamento_mensal.append(None)
+                reais.append(parse_numero(real))
+        self.real = np.array(reais, dtype=float)
+
+        self.melhores_vendedores = [parse_vendedores(v) for v in coluna("melhores_vendedores")]
+        self.piores_vendedores = [parse_vendedores(v) for v in coluna("piores_vendedores")]
+
+        # (categoria, indicador) em minúsculas -> linha; vale a primeira ocorrência
+        self.por_chave = {}
+        for pos, (cat, ind) in enumerate(zip(self.categoria, self.indicador)):
+            self.por_chave.setdefault((cat.lower(), ind.lower()), pos)
+
+    def __len__(self):
+        return len(self.indicador)
+
+    def buscar(self, categoria: str, indicador: str):
+        """Posição da primeira linha com essa categoria/indicador (sem caixa), ou None."""
+        return self.por_chave.get((categoria.lower(), indicador.lower()))
+
+    def registro(self, pos: int) -> RegistroKB:
+        return RegistroKB(self, pos)
+
+_MODEL_CACHE = CachePorDataFrame(KnowledgeBaseModel)
+
+def get_kb_model(knowledge_base: pd.DataFrame) -> KnowledgeBaseModel:
+    """Devolve o KnowledgeBaseModel do DataFrame, convertendo apenas se a versão mudou."""
+    return _MODEL_CACHE.obter(knowledge_base)
@@ -0,0 +1,52 @@
+import threading
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+# Pool HTTP compartilhado por todos os clientes do processo (keep-alive entre
+# sessões e reruns do Streamlit, sem novo handshake TLS por chamada)
+HTTP_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=120)
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+
+_http_client = None
+_clientes = {}
+_lock = threading.Lock()
+
+def get_http_client() -> httpx.Client:
+    """Cliente httpx único do processo, com pool de conexões keep-alive."""
+    global _http_client
+    with _lock:
+        if _http_client is None or _http_client.is_closed:
+            _http_client = httpx.Client(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+        return _http_client
+
+def get_llm(model: str = "gpt-4o-mini", temperature: float = 0.7, max_tokens: int = 1000, **kwargs) -> ChatOpenAI:
+    """
+    Devolve o ChatOpenAI do registro do processo para (model, temperature, max_tokens),
+    criando-o na primeira vez. Todos compartilham o mesmo pool HTTP.
+    Parâmetros extras (ex.: base_url em testes) entram na chave do registro.
+    """
+    chave = (model, temperature, max_tokens, tuple(sorted(kwargs.items())))
+    with _lock:
+        llm = _clientes.get(chave)
+    if llm is not None:
+        return llm
+
+    llm = ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        http_client=get_http_client(),
+        **kwargs
+    )
+    with _lock:
+        return _clientes.setdefault(chave, llm)
+
+def fechar_clientes():
+    """Fecha o pool HTTP e esvazia o registro (útil em testes ou no shutdown)."""
+    global _http_client
+    with _lock:
+        _clientes.clear()
+        if _http_client is not None:
+            _http_client.close()
+            _http_client = None
@@ -0,0 +1,175 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+from .llm import get_llm
+from utils.state_files import caminho_local
+
+# Local da máquina (WAL não é confiável no compartilhamento); LLM_CACHE_PATH muda
+CACHE_PATH = caminho_local("llm_cache.sqlite3", "LLM_CACHE_PATH")
+
+# Limites do cache (configuráveis por variável de ambiente)
+MAX_ENTRADAS = int(os.getenv("LLM_CACHE_MAX_ENTRADAS", "2000"))
+TTL_SEGUNDOS = int(os.getenv("LLM_CACHE_TTL", str(24 * 3600)))
+
+# O nome do usuário sai da chave e da resposta guardada, para que vendedores
+# diferentes compartilhem a mesma entrada; na leitura o nome é recolocado.
+# Só a palavra inteira: "Admin" não pode virar marcador dentro de "Administração"
+MARCADOR_USUARIO = "{{usuario}}"
+
+def _anonimizar(texto: str, username: str) -> str:
+    if username and len(username) >= 3:
+        padrao = r"(?<!\w)" + re.escape(username) + r"(?!\w)"
+        return re.sub(padrao, lambda _: MARCADOR_USUARIO, texto)
+    return texto
+
+def chave_prompt(msgs, params: dict, username: str = None) -> str:
+    """Hash do prompt normalizado (espaços colapsados, sem o nome do usuário) + parâmetros do modelo."""
+    if isinstance(msgs, str):
+        msgs = [{"role": "user", "content": msgs}]
+    normalizadas = [
+        (m["role"], re.sub(r"\s+", " ", _anonimizar(m["content"], username)).strip())
+        for m in msgs
+    ]
+    payload = json.dumps([normalizadas, sorted(params.items())], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class LLMResponseCache:
+    """
+    Cache em SQLite das respostas do LLM.
+
+    Cada entrada guarda a 'versao' dos dados usados no prompt (ex.: a
+    data_atualizacao da linha do knowledge_base); se a versão mudar, ou o TTL
+    vencer, a entrada é descartada. Acima de max_entradas, as menos acessadas
+    recentemente são removidas (LRU).
+    """
+
+    def __init__(self, caminho: str = CACHE_PATH, max_entradas: int = MAX_ENTRADAS, ttl: int = TTL_SEGUNDOS):
+        self.caminho = caminho
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _conexao(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+            conn = sqlite3.connect(self.caminho, check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS respostas (
+                    chave TEXT PRIMARY KEY,
+                    versao TEXT NOT NULL,
+                    resposta TEXT NOT NULL,
+                    criado_em REAL NOT NULL,
+                    acessado_em REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_respostas_acesso ON respostas (acessado_em)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, chave: str, versao: str = ""):
+        """Resposta guardada para a chave, ou None (ausente, vencida ou de outra versão)."""
+        agora = time.time()
+        with self._lock:
+            conn = self._conexao()
+            row = conn.execute(
+                "SELECT versao, resposta, criado_em FROM respostas WHERE chave = ?", (chave,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            versao_salva, resposta, criado_em = row
+            if versao_salva != versao or (agora - criado_em) > self.ttl:
+                conn.execute("DELETE FROM respostas WHERE chave = ?", (chave,))
+                conn.commit()
+                self.misses += 1
+                return None
+            conn.execute("UPDATE respostas SET acessado_em = ? WHERE chave = ?", (agora, chave))
+            conn.commit()
+            self.hits += 1
+            return resposta
+
+    def set(self, chave: str, resposta: str, versao: str = ""):
+        agora = time.time()
+        with self._lock:
+            conn = self._conexao()
+            conn.execute(
+                "INSERT OR REPLACE INTO respostas (chave, versao, resposta, criado_em, acessado_em) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (chave, versao, resposta, agora, agora)
+            )
+            total = conn.execute("SELECT COUNT(*) FROM respostas").fetchone()[0]
+            if total > self.max_entradas:
+                conn.execute(
+                    "DELETE FROM respostas WHERE chave IN "
+                    "(SELECT chave FROM respostas ORDER BY acessado_em ASC LIMIT ?)",
+                    (total - self.max_entradas,)
+                )
+            conn.commit()
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "taxa_acerto": self.hits / total if total else 0.0,
+            }
+
+    def limpar(self):
+        with self._lock:
+            conn = self._conexao()
+            conn.execute("DELETE FROM respostas")
+            conn.commit()
+
+cache = LLMResponseCache()
+
+def _ler_cache(chave: str, versao: str, username: str):
+    try:
+        resposta = cache.get(chave, versao)
+    except (sqlite3.Error, OSError):
+        return None  # cache é opcional: falha de disco não derruba a resposta
+    if resposta is None:
+        return None
+    return resposta.replace(MARCADOR_USUARIO, username or "")
+
+def _gravar_cache(chave: str, resposta: str, versao: str, username: str):
+    try:
+        cache.set(chave, _anonimizar(resposta, username), versao)
+    except (sqlite3.Error, OSError):
+        pass
+
+def stream_com_cache(msgs, versao: str = "", username: str = None, **llm_params):
+    """
+    llm.stream(msgs) passando pelo cache: gera os tokens conforme chegam do
+    LLM e grava a resposta completa no cache ao final. Num hit, gera a resposta
+    guardada de uma vez. 'versao' invalida a entrada quando os dados de origem
+    mudam; 'username' é tirado da chave.
+    """
+    chave = chave_prompt(msgs, llm_params, username)
+    resposta = _ler_cache(chave, versao, username)
+    if resposta is not None:
+        yield resposta
+        return
+
+    partes = []
+    for chunk in get_llm(**llm_params).stream(msgs):
+        texto = chunk.content
+        if not texto:
+            continue
+        if not partes:
+            texto = texto.lstrip()
+        partes.append(texto)
+        yield texto
+    _gravar_cache(chave, "".join(partes).strip(), versao, username)
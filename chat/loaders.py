@@ -1,27 +1,99 @@
-import streamlit as st
-import pandas as pd
 import os
-import re
-
-@st.cache_data(ttl=60)
-def load_csv(file_path="knowledge_base.csv"):
-    if os.path.exists(file_path):
-        return pd.read_csv(file_path, delimiter=";", encoding="ISO-8859-1")
-    else:
-        return pd.DataFrame(
-            columns=[
-                "categoria","subcategoria","indicador","meta","real","percentual_atual",
-                "melhores_vendedores","piores_vendedores","dias_faltantes","data_atualizacao","fonte"
-            ]
-        )
-
-@st.cache_data(ttl=60)
+import threading
+
+import pandas as pd
+
+from utils.csv_cache import carregar_csv
+from utils import kb_backend
+
+KB_COLUMNS = [
+    "categoria","subcategoria","indicador","meta","real","percentual_atual",
+    "melhores_vendedores","piores_vendedores","dias_faltantes","data_atualizacao","fonte"
+]
+INSTRUCTIONS_COLUMNS = [
+    "categoria","descricao_categoria","nome_coluna","descricao","sinonimos","estrategia_resposta"
+]
+
+class CarregadorCSV:
+    """
+    Carrega um CSV e guarda o DataFrame já lido enquanto o arquivo não muda.
+
+    A cada chamada compara (mtime, tamanho) do arquivo; só quando eles mudam
+    o arquivo é relido (via cache Arrow, ver utils.csv_cache) e o hash
+    comparado. Hash igual (ex.: arquivo salvo sem alterações) devolve o mesmo
+    objeto; hash diferente troca o DataFrame na hora.
+    O hash vai em df.attrs["versao"], usado pelos índices do chat
+    (CachePorDataFrame) para reconstruir apenas numa mudança real.
+
+    O DataFrame devolvido é compartilhado entre sessões: não altere in-place.
+    """
+
+    def __init__(self, file_path: str, colunas: list, base_conhecimento: bool = False):
+        self.file_path = file_path
+        self.colunas = colunas
+        # knowledge_base: lido pelo backend configurado (CSV + journal ou SQLite, ver utils.kb_backend)
+        self.base_conhecimento = base_conhecimento
+        self._assinatura = None
+        self._versao = None
+        self._df = None
+        self._lock = threading.Lock()
+
+    def _assinatura_atual(self):
+        arquivos = kb_backend.arquivos(self.file_path) if self.base_conhecimento else [self.file_path]
+        assinatura = ()
+        for arquivo in arquivos:
+            try:
+                st = os.stat(arquivo)
+            except OSError:
+                if arquivo == arquivos[0]:
+                    return None
+                continue
+            assinatura += (st.st_mtime_ns, st.st_size)
+        return assinatura
+
+    def carregar(self) -> pd.DataFrame:
+        assinatura = self._assinatura_atual()
+        with self._lock:
+            if self._df is not None and assinatura == self._assinatura:
+                return self._df
+
+            if assinatura is None:
+                df = pd.DataFrame(columns=self.colunas)
+                df.attrs["versao"] = "vazio"
+                self._assinatura, self._versao, self._df = None, "vazio", df
+                return df
+
+            if self.base_conhecimento:
+                df, versao = kb_backend.carregar(self.file_path, self.colunas)
+            else:
+                df, versao = carregar_csv(self.file_path, self.colunas)
+            if versao != self._versao:
+                df.attrs["versao"] = versao
+                self._df = df
+                self._versao = versao
+            self._assinatura = assinatura
+            return self._df
+
+    @property
+    def versao(self):
+        return self._versao
+
+_carregadores = {}
+_carregadores_lock = threading.Lock()
+
+def get_carregador(file_path: str, colunas: list, base_conhecimento: bool = False) -> CarregadorCSV:
+    """Um CarregadorCSV por caminho, compartilhado pelo processo."""
+    chave = os.path.abspath(file_path)
+    with _carregadores_lock:
+        carregador = _carregadores.get(chave)
+        if carregador is None:
+            carregador = _carregadores[chave] = CarregadorCSV(file_path, colunas, base_conhecimento)
+    return carregador
+
+KB_PATH = "knowledge_base.csv"
+
+def load_csv(file_path=KB_PATH):
+    return get_carregador(file_path, KB_COLUMNS, base_conhecimento=True).carregar()
+
 def load_instructions(file_path="instructions.csv"):
-    if os.path.exists(file_path):
-        return pd.read_csv(file_path, delimiter=";", encoding="ISO-8859-1")
-    else:
-        return pd.DataFrame(
-            columns=[
-                "categoria","descricao_categoria","nome_coluna","descricao","sinonimos","estrategia_resposta"
-            ]
-        )
+    return get_carregador(file_path, INSTRUCTIONS_COLUMNS).carregar()
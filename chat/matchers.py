@@ -1,6 +1,189 @@
-from fuzzywuzzy import fuzz, process
+from fuzzywuzzy import utils as fuzz_utils
+import numpy as np
 import pandas as pd
-from .utils import remove_punct_lower
+from .utils import remove_punct_lower, CachePorDataFrame
+from .scoring import bulk_partial_ratio, melhor_score
+
+def _texto(valor) -> str:
+    """Converte células do CSV para str, tratando None/NaN como vazio."""
+    if valor is None:
+        return ""
+    if isinstance(valor, float) and valor != valor:
+        return ""
+    return str(valor)
+
+def _clean_synonyms(syns_str: str) -> list:
+    return [s.strip() for s in syns_str.split(",") if s.strip()]
+
+# Tamanho dos n-gramas de caracteres e quantos candidatos seguem para o fuzzy
+NGRAM_N = 3
+SHORTLIST_TAMANHO = 50
+
+def _ngramas(texto: str, n: int = NGRAM_N) -> set:
+    """n-gramas de caracteres do texto, com espaço nas bordas (pega palavras curtas como 'gc')."""
+    texto = f" {texto} "
+    return {texto[i:i + n] for i in range(len(texto) - n + 1)}
+
+class MatcherIndex:
+    """
+    Índice pré-computado sobre o instructions.csv.
+
+    Guarda, por linha, nome/descrição/estratégia já normalizados, um dict
+    {nome ou sinônimo normalizado -> linhas} para o match exato em O(1)
+    e o "documento" (nome + sinônimos + descrição + estratégia) já limpo
+    para o fuzzy. É montado uma vez por versão do CSV (ver get_matcher_index).
+
+    Sobre os documentos há ainda um índice invertido de n-gramas (trigramas),
+    usado para reduzir o fuzzy aos SHORTLIST_TAMANHO candidatos que mais
+    compartilham n-gramas com a pergunta quando a base é grande.
+    """
+
+    def __init__(self, instructions_df: pd.DataFrame):
+        self.categorias = []
+        self.nomes = []
+        self.descricoes = []
+        self.estrategias = []
+        self.sinonimos = []
+        self.documentos = []
+        self.exatos = {}
+        self.por_categoria = {}
+        self.por_chave = {}
+
+        for col in ["categoria", "nome_coluna", "descricao", "sinonimos", "estrategia_resposta"]:
+            if col not in instructions_df.columns:
+                instructions_df = instructions_df.assign(**{col: None})
+
+        colunas = zip(
+            instructions_df["categoria"].tolist(),
+            instructions_df["nome_coluna"].tolist(),
+            instructions_df["descricao"].tolist(),
+            instructions_df["sinonimos"].tolist(),
+            instructions_df["estrategia_resposta"].tolist(),
+        )
+        for pos, (cat, nome, desc, syns_str, strat) in enumerate(colunas):
+            cat = _texto(cat)
+            nome = _texto(nome)
+            desc = _texto(desc)
+            strat = _texto(strat)
+            syns = _clean_synonyms(_texto(syns_str))
+
+            self.categorias.append(cat)
+            self.nomes.append(nome)
+            self.descricoes.append(desc)
+            self.estrategias.append(strat)
+            self.sinonimos.append(syns)
+            self.por_categoria.setdefault(cat.lower(), []).append(pos)
+            self.por_chave.setdefault((cat.lower(), nome.lower()), pos)
+
+            for chave in [nome] + syns:
+                posicoes = self.exatos.setdefault(remove_punct_lower(chave), [])
+                if not posicoes or posicoes[-1] != pos:
+                    posicoes.append(pos)
+
+            self.documentos.append(remove_punct_lower(" ".join([nome] + syns + [desc, strat])))
+
+        postings = {}
+        for pos, doc in enumerate(self.documentos):
+            for grama in _ngramas(doc):
+                postings.setdefault(grama, []).append(pos)
+        self.ngramas = {g: np.asarray(p, dtype=np.int32) for g, p in postings.items()}
+
+        # Categorias visíveis (tudo menos 'dados') na ordem do CSV, já no formato
+        # que o process.extractOne usaria (full_process).
+        self.categorias_visiveis = [
+            c for c in instructions_df["categoria"].dropna().unique()
+            if isinstance(c, str) and c.lower() != "dados"
+        ]
+        self.categorias_processadas = [fuzz_utils.full_process(c) for c in self.categorias_visiveis]
+
+    def __len__(self):
+        return len(self.nomes)
+
+    def posicoes(self, categorias=None) -> list:
+        """Linhas das categorias informadas (minúsculas) ou de todas, se None."""
+        if categorias is None:
+            return list(range(len(self)))
+        resultado = []
+        for cat in categorias:
+            resultado.extend(self.por_categoria.get(cat.lower(), []))
+        return sorted(resultado)
+
+    def linha_instrucao(self, categoria: str, nome_coluna: str):
+        """
+        Linha do instructions.csv para (categoria, nome_coluna), sem caixa; se
+        não houver, a primeira linha da categoria. None se a categoria não existe.
+        """
+        pos = self.por_chave.get((categoria.lower(), nome_coluna.lower()))
+        if pos is not None:
+            return pos
+        linhas = self.por_categoria.get(categoria.lower())
+        return linhas[0] if linhas else None
+
+    def match_exato(self, question_clean: str, posicoes: list):
+        """Primeira linha (na ordem do CSV) cujo nome/sinônimo é igual à pergunta."""
+        candidatas = self.exatos.get(question_clean)
+        if not candidatas:
+            return None
+        permitidas = set(posicoes)
+        for pos in candidatas:
+            if pos in permitidas:
+                return pos
+        return None
+
+    def shortlist(self, question_clean: str, posicoes: list, limite: int = SHORTLIST_TAMANHO) -> list:
+        """
+        Reduz 'posicoes' às 'limite' linhas que mais compartilham n-gramas com a
+        pergunta (mantendo a ordem do CSV). Com poucas linhas devolve tudo.
+        """
+        if len(posicoes) <= limite:
+            return posicoes
+        gramas = _ngramas(question_clean) if question_clean else set()
+        if not gramas:
+            return posicoes
+
+        contagem = np.zeros(len(self), dtype=np.int32)
+        for grama in gramas:
+            linhas = self.ngramas.get(grama)
+            if linhas is not None:
+                contagem[linhas] += 1
+
+        candidatas = np.asarray(posicoes, dtype=np.int32)
+        votos = contagem[candidatas]
+        top = np.argpartition(-votos, limite - 1)[:limite]
+        top = top[votos[top] > 0]
+        return sorted(candidatas[top].tolist())
+
+    def match_fuzzy(self, question_clean: str, posicoes: list, score_cutoff: int = 70):
+        """
+        Retorna (linha, score) com o maior partial_ratio entre os documentos,
+        ou (None, 0) se nenhum atingir o score_cutoff. Em bases grandes o fuzzy
+        roda apenas sobre a shortlist de n-gramas.
+        """
+        posicoes = self.shortlist(question_clean, posicoes)
+        documentos = [self.documentos[pos] for pos in posicoes]
+        idx, score = melhor_score(question_clean, documentos, score_cutoff)
+        if idx is None:
+            return None, 0
+        return posicoes[idx], score
+
+    def match_exato_fuzzy(self, question: str, posicoes: list):
+        """Mesmo contrato de match_local_exato_fuzzy, restrito às linhas informadas."""
+        question_clean = remove_punct_lower(question)
+
+        pos = self.match_exato(question_clean, posicoes)
+        if pos is not None:
+            return self.nomes[pos], self.descricoes[pos], self.estrategias[pos], 100
+
+        pos, score = self.match_fuzzy(question_clean, posicoes)
+        if pos is not None:
+            return self.nomes[pos], self.descricoes[pos], self.estrategias[pos], score
+        return None, None, None, 0
+
+_INDEX_CACHE = CachePorDataFrame(MatcherIndex)
+
+def get_matcher_index(instructions_df: pd.DataFrame) -> MatcherIndex:
+    """Devolve o MatcherIndex do DataFrame, construindo apenas se a versão mudou."""
+    return _INDEX_CACHE.obter(instructions_df)
 
 def handle_detail_level_choice(choice: str):
     """Identifica se o usuário quer 'detalhado' ou 'resumido'."""
@@ -14,8 +197,9 @@ def handle_detail_level_choice(choice: str):
     # Fuzzy
     detail_keywords = ["detalhado","detalhada","detalhe"]
     summary_keywords = ["resumido","resumo"]
-    best_score_detail = max(fuzz.partial_ratio(choice_clean,k) for k in detail_keywords)
-    best_score_summary = max(fuzz.partial_ratio(choice_clean,k) for k in summary_keywords)
+    scores = bulk_partial_ratio(choice_clean, detail_keywords + summary_keywords, 70)
+    best_score_detail = scores[:len(detail_keywords)].max()
+    best_score_summary = scores[len(detail_keywords):].max()
 
     if best_score_detail >= 70:
         return "Detalhado"
@@ -25,15 +209,16 @@ def handle_detail_level_choice(choice: str):
 
 def match_any_category(question: str, instructions_df: pd.DataFrame) -> str:
     """Faz fuzzy com TODAS as categorias, exceto 'dados'."""
-    cats_series = instructions_df["categoria"].dropna().unique()
-    cats_list = [c for c in cats_series if c.lower() != "dados"]
-    if not cats_list:
+    index = get_matcher_index(instructions_df)
+    if not index.categorias_visiveis:
         return None
 
-    question_clean = remove_punct_lower(question)
-    best, score = process.extractOne(question_clean, cats_list, scorer=fuzz.partial_ratio)
-    if best and score>75:
-        return best
+    # Mesmo pré-processamento do process.extractOne (full_process na pergunta
+    # e nas categorias), mas com as categorias já processadas no índice.
+    question_clean = fuzz_utils.full_process(remove_punct_lower(question))
+    pos, score = melhor_score(question_clean, index.categorias_processadas, 76)
+    if pos is not None and score>75:
+        return index.categorias_visiveis[pos]
     return None
 
 def match_local_exato_fuzzy(question: str, df_items: pd.DataFrame):
@@ -41,103 +226,32 @@ def match_local_exato_fuzzy(question: str, df_items: pd.DataFrame):
     Recebe DataFrame com colunas: [nome_coluna, sinonimos, descricao, estrategia_resposta].
     Faz match exato e fuzzy. Retorna (best_nome, best_desc, best_strat, best_score).
     """
-    def clean_synonyms(syns_str):
-        if isinstance(syns_str, str):
-            return [s.strip() for s in syns_str.split(",") if s.strip()]
-        return []
-
-    question_clean = remove_punct_lower(question)
-    best_score = 0
-    best_nome = None
-    best_desc = None
-    best_strat = None
-
-    # 1) match exato
-    for _, row in df_items.iterrows():
-        nome = row.get("nome_coluna", "") or ""
-        desc = row.get("descricao", "") or ""
-        strat = row.get("estrategia_resposta", "") or ""
-        syns_str = row.get("sinonimos", "") or ""
-        syns = clean_synonyms(syns_str)
-
-        if remove_punct_lower(nome) == question_clean:
-            return nome, desc, strat, 100
-        for syn in syns:
-            if remove_punct_lower(syn) == question_clean:
-                return nome, desc, strat, 100
-
-    # 2) fuzzy
-    for _, row in df_items.iterrows():
-        nome = row.get("nome_coluna", "") or ""
-        desc = row.get("descricao", "") or ""
-        strat = row.get("estrategia_resposta", "") or ""
-        syns_str = row.get("sinonimos", "") or ""
-        syns = clean_synonyms(syns_str)
-
-        doc_pieces = [str(piece) for piece in [nome] + syns + [desc, strat]]
-        doc_clean = remove_punct_lower(" ".join(doc_pieces))
-
-        sc = fuzz.partial_ratio(question_clean, doc_clean)
-        if sc > best_score:
-            best_score = sc
-            best_nome = nome
-            best_desc = desc
-            best_strat = strat
-
-    if best_score >= 70:
-        return best_nome, best_desc, best_strat, best_score
-    return None, None, None, 0
+    index = get_matcher_index(df_items)
+    return index.match_exato_fuzzy(question, index.posicoes())
 
 def match_dados_local(question: str, instructions_df: pd.DataFrame):
-    df_dados = instructions_df[instructions_df["categoria"].str.lower()=="dados"]
-    if df_dados.empty:
+    index = get_matcher_index(instructions_df)
+    posicoes = index.posicoes(["dados"])
+    if not posicoes:
         return None, None, None, 0
 
-    nome, desc, strat, score = match_local_exato_fuzzy(question, df_dados)
-    return nome, desc, strat, score
+    return index.match_exato_fuzzy(question, posicoes)
 
 def match_any_item_in_category(category: str, question: str, instructions_df: pd.DataFrame):
-    df_cat = instructions_df[instructions_df["categoria"].str.lower()==category.lower()]
-    if df_cat.empty:
+    index = get_matcher_index(instructions_df)
+    posicoes = index.posicoes([category])
+    if not posicoes:
         return None, None, None, 0
 
-    nome, desc, strat, score = match_local_exato_fuzzy(question, df_cat)
-    return nome, desc, strat, score
+    return index.match_exato_fuzzy(question, posicoes)
 
 def match_kpi_recurso_local(question: str, instructions_df: pd.DataFrame):
-    relevant_df = instructions_df[
-        instructions_df["categoria"].str.lower().isin(["kpi", "recurso"])
-    ]
-    if relevant_df.empty:
+    index = get_matcher_index(instructions_df)
+    posicoes = index.posicoes(["kpi", "recurso"])
+    if not posicoes:
         return None, None, 0
 
-    def clean_synonyms(syns_str):
-        if isinstance(syns_str, str):
-            return [s.strip() for s in syns_str.split(",") if s.strip()]
-        return []
-
-    question_clean = remove_punct_lower(question)
-    best_score = 0
-    best_category = None
-    best_name = None
-
-    for _, row in relevant_df.iterrows():
-        cat = row.get("categoria", "")
-        nome = row.get("nome_coluna", "") or ""
-        desc = row.get("descricao", "") or ""
-        strat = row.get("estrategia_resposta", "") or ""
-        syns_str = row.get("sinonimos", "") or ""
-        syns = clean_synonyms(syns_str)
-
-        doc_pieces = [str(piece) for piece in [nome] + syns + [desc, strat]]
-        doc_clean = remove_punct_lower(" ".join(doc_pieces))
-
-        sc = fuzz.partial_ratio(question_clean, doc_clean)
-        if sc > best_score:
-            best_score = sc
-            best_category = cat
-            best_name = nome
-
-    if best_score >= 70:
-        return best_category, best_name, best_score
+    pos, best_score = index.match_fuzzy(remove_punct_lower(question), posicoes)
+    if pos is not None:
+        return index.categorias[pos], index.nomes[pos], best_score
     return None, None, 0
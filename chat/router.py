@@ -0,0 +1,64 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Liga/desliga o disparo em paralelo dos fallbacks de LLM (só quando as
+# etapas locais não resolvem)
+ROTEAMENTO_ESPECULATIVO = os.getenv("CHAT_ROTEAMENTO_ESPECULATIVO", "1") == "1"
+
+# Pool compartilhado pelo processo (todas as sessões do Streamlit)
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="chat-router")
+
+class Etapa:
+    """
+    Uma etapa do roteamento: 'funcao' (sem argumentos) produz o resultado e
+    'aceitar' diz se ele resolve a pergunta. Etapas 'especulativas' (as que
+    chamam o LLM) só rodam se nenhuma etapa local anterior a elas resolveu;
+    aí as candidatas são disparadas juntas no pool.
+
+    As funções rodam fora da thread do Streamlit quando especulativas, então
+    não podem tocar em st.session_state.
+    """
+
+    def __init__(self, nome: str, funcao, aceitar, especulativa: bool = False):
+        self.nome = nome
+        self.funcao = funcao
+        self.aceitar = aceitar
+        self.especulativa = especulativa
+
+def rotear(etapas: list):
+    """
+    Devolve (nome, resultado) da primeira etapa aceita, na ordem de
+    prioridade, ou (None, None).
+
+    As etapas locais (baratas) rodam primeiro, até uma aceitar; se essa
+    aceita não tem etapa de LLM antes dela, o LLM nem é chamado. Senão, só as
+    etapas de LLM anteriores a ela são disparadas (em paralelo, com
+    ROTEAMENTO_ESPECULATIVO) e avaliadas em ordem; ao decidir, as que ainda
+    não começaram são canceladas.
+    """
+    aceita_local, resultado_local = len(etapas), None
+    for i, etapa in enumerate(etapas):
+        if not etapa.especulativa:
+            resultado = etapa.funcao()
+            if etapa.aceitar(resultado):
+                aceita_local, resultado_local = i, resultado
+                break
+    candidatas = [i for i in range(aceita_local) if etapas[i].especulativa]
+
+    futuros = {}
+    if ROTEAMENTO_ESPECULATIVO and len(candidatas) > 1:
+        futuros = {i: _executor.submit(etapas[i].funcao) for i in candidatas}
+
+    try:
+        for i in candidatas:
+            futuro = futuros.get(i)
+            resultado = futuro.result() if futuro is not None else etapas[i].funcao()
+            if etapas[i].aceitar(resultado):
+                return etapas[i].nome, resultado
+        if aceita_local < len(etapas):
+            return etapas[aceita_local].nome, resultado_local
+        return None, None
+    finally:
+        for i, futuro in futuros.items():
+            if not futuro.done() and not futuro.cancel():
+                print(f"[Chat] Etapa '{etapas[i].nome}' descartada (já em execução).")
@@ -0,0 +1,58 @@
+import numpy as np
+from fuzzywuzzy import fuzz
+
+try:
+    from rapidfuzz import fuzz as rf_fuzz, process as rf_process
+except ImportError:  # rapidfuzz é opcional; sem ele usamos só o fuzzywuzzy
+    rf_fuzz = None
+    rf_process = None
+
+def _partial_ratio_fuzzywuzzy(query: str, documentos: list) -> np.ndarray:
+    return np.fromiter(
+        (fuzz.partial_ratio(query, doc) for doc in documentos),
+        dtype=np.int32,
+        count=len(documentos),
+    )
+
+def bulk_partial_ratio(query: str, documentos: list, score_cutoff: int = 0) -> np.ndarray:
+    """
+    Calcula fuzz.partial_ratio(query, doc) para todos os documentos de uma vez
+    e devolve um vetor NumPy (int32, 0-100) na mesma ordem de 'documentos'.
+
+    Com rapidfuzz instalado, todos os candidatos são pontuados numa única chamada
+    em C (process.cdist). O partial_ratio do rapidfuzz faz o alinhamento ótimo e
+    nunca fica abaixo do score do fuzzywuzzy, então só os candidatos que chegam ao
+    'score_cutoff' são recalculados com o fuzzywuzzy. Resultado: todo score
+    >= score_cutoff é idêntico ao de hoje (limiares 70/75 continuam valendo) e os
+    demais apenas garantem ficar abaixo do corte.
+
+    Sem rapidfuzz, cai no laço com fuzzywuzzy (scores exatos em todas as posições).
+    """
+    if not documentos:
+        return np.zeros(0, dtype=np.int32)
+
+    if rf_process is None:
+        return _partial_ratio_fuzzywuzzy(query, documentos)
+
+    aproximados = rf_process.cdist([query], documentos, scorer=rf_fuzz.partial_ratio)[0]
+    scores = np.floor(aproximados).astype(np.int32)
+
+    # Recalcula exatamente (semântica fuzzywuzzy) só quem pode passar do corte.
+    # O fuzzywuzzy arredonda o score, daí a folga de meio ponto.
+    for pos in np.flatnonzero(aproximados >= score_cutoff - 0.5):
+        scores[pos] = fuzz.partial_ratio(query, documentos[pos])
+    return scores
+
+def melhor_score(query: str, documentos: list, score_cutoff: int = 0):
+    """
+    Retorna (posição, score) do melhor documento, respeitando o primeiro em caso
+    de empate, ou (None, 0) se nenhum atingir o 'score_cutoff'.
+    """
+    scores = bulk_partial_ratio(query, documentos, score_cutoff)
+    if scores.size == 0:
+        return None, 0
+    pos = int(np.argmax(scores))
+    score = int(scores[pos])
+    if score < score_cutoff or score == 0:
+        return None, 0
+    return pos, score
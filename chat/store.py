@@ -0,0 +1,71 @@
+import threading
+
+import streamlit as st
+
+from .loaders import load_csv, load_instructions
+from .kb_model import get_kb_model
+from .matchers import get_matcher_index
+from .watcher import KBWatcher
+from utils import kb_backend
+
+class SnapshotKB:
+    """
+    Foto imutável dos dados do chat numa versão: os DataFrames lidos, o
+    KnowledgeBaseModel e o MatcherIndex. É compartilhada por todas as sessões
+    sem cópia; uma recarga cria outra foto, nunca altera esta.
+    """
+
+    __slots__ = ("versao", "knowledge_base", "instructions", "kb_model", "matcher_index")
+
+    def __init__(self, knowledge_base, instructions):
+        object.__setattr__(self, "versao", (knowledge_base.attrs.get("versao"), instructions.attrs.get("versao")))
+        object.__setattr__(self, "knowledge_base", knowledge_base)
+        object.__setattr__(self, "instructions", instructions)
+        object.__setattr__(self, "kb_model", get_kb_model(knowledge_base))
+        object.__setattr__(self, "matcher_index", get_matcher_index(instructions))
+
+    def __setattr__(self, nome, valor):
+        raise AttributeError("SnapshotKB é somente leitura")
+
+class KBStore:
+    """
+    Guarda a foto atual e a troca de forma atômica quando algum CSV muda
+    (a checagem é a do loader: stat do arquivo e hash só se ele mudou).
+    Quem já pegou a foto antiga continua com ela até o fim da pergunta.
+    """
+
+    def __init__(self, kb_path: str = "knowledge_base.csv", instructions_path: str = "instructions.csv"):
+        self.kb_path = kb_path
+        self.instructions_path = instructions_path
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> SnapshotKB:
+        knowledge_base = load_csv(self.kb_path)
+        instructions = load_instructions(self.instructions_path)
+        atual = self._snapshot
+        if atual is not None and atual.knowledge_base is knowledge_base and atual.instructions is instructions:
+            return atual
+
+        with self._lock:
+            atual = self._snapshot
+            if atual is None or atual.knowledge_base is not knowledge_base or atual.instructions is not instructions:
+                self._snapshot = SnapshotKB(knowledge_base, instructions)
+            return self._snapshot
+
+    @property
+    def versao(self):
+        atual = self._snapshot
+        return atual.versao if atual is not None else None
+
+@st.cache_resource
+def get_store() -> KBStore:
+    """
+    Store único do processo (cache_resource não copia o objeto entre sessões),
+    já carregado e com o watcher que o recarrega quando os CSVs mudam.
+    """
+    store = KBStore()
+    store.snapshot()
+    arquivos = kb_backend.arquivos(store.kb_path) + [store.instructions_path]
+    KBWatcher(store, arquivos).iniciar()
+    return store
@@ -0,0 +1,151 @@
+import threading
+import unicodedata
+
+import numpy as np
+
+from .utils import remove_punct_lower
+from .scoring import bulk_partial_ratio
+from .embeddings import embedding_hash_ngramas
+from .gpt import analyze_context_with_gpt
+
+# Frases que indicam mudança de assunto (sem acento, já normalizadas)
+FRASES_NOVO_TOPICO = [
+    "novo topico", "mudar de assunto", "mudando de assunto", "muda de assunto",
+    "trocar de assunto", "trocar de topico", "troca de assunto", "outro assunto",
+    "qualquer outro assunto", "outro topico", "vamos falar de outra coisa",
+    "falar de outra coisa", "esquece isso", "comecar de novo", "recomecar",
+]
+
+# Faixa do fuzzy em que a regra não decide sozinha
+FUZZY_NOVO = 90
+FUZZY_CONTINUAR = 70
+
+# Classificador leve (protótipos por similaridade de embedding): abaixo/acima
+# destes limites ele decide; entre eles a mensagem vai para o LLM. Palavra
+# solta ("outro", "assunto", "esquece") tem n-gramas em comum com as frases e
+# pontua 0,65-0,77, então o classificador só marca novo tópico a partir de
+# CLASSIF_MIN_PALAVRAS palavras; abaixo disso continua ambíguo
+CLASSIF_NOVO = 0.70
+CLASSIF_CONTINUAR = 0.35
+CLASSIF_MIN_PALAVRAS = 2
+
+FEEDBACK_NOVO = "Ok, vamos iniciar um novo tópico."
+FEEDBACK_CONTINUAR = "Continuando no mesmo fluxo."
+
+def _sem_acentos(texto: str) -> str:
+    texto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+def _normalizar(texto: str) -> str:
+    return _sem_acentos(remove_punct_lower(texto or ""))
+
+class EstatisticasTopico:
+    """Contadores de como cada mensagem foi decidida (regra, classificador ou LLM)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total = 0
+        self.por_regra = 0
+        self.por_classificador = 0
+        self.escalonadas = 0
+
+    def registrar(self, origem: str):
+        with self._lock:
+            self.total += 1
+            if origem == "regra":
+                self.por_regra += 1
+            elif origem == "classificador":
+                self.por_classificador += 1
+            else:
+                self.escalonadas += 1
+
+    def taxa_escalonamento(self) -> float:
+        with self._lock:
+            return self.escalonadas / self.total if self.total else 0.0
+
+    def como_dict(self) -> dict:
+        with self._lock:
+            return {
+                "total": self.total,
+                "por_regra": self.por_regra,
+                "por_classificador": self.por_classificador,
+                "escalonadas": self.escalonadas,
+            }
+
+estatisticas = EstatisticasTopico()
+
+_prototipos = None
+_prototipos_lock = threading.Lock()
+
+def _matriz_prototipos():
+    global _prototipos
+    with _prototipos_lock:
+        if _prototipos is None:
+            _prototipos = embedding_hash_ngramas(FRASES_NOVO_TOPICO)
+    return _prototipos
+
+def classificador_prototipos(texto_normalizado: str) -> float:
+    """
+    Classificador leve padrão: maior similaridade de cosseno entre a mensagem
+    e as frases de mudança de assunto (0-1).
+    """
+    vetor = embedding_hash_ngramas([texto_normalizado])[0]
+    return float(np.max(_matriz_prototipos() @ vetor))
+
+_classificador = classificador_prototipos
+
+def set_classificador(fn):
+    """
+    Troca o classificador opcional (texto normalizado -> probabilidade 0-1 de
+    ser novo tópico). Use None para desligar e escalar direto ao LLM.
+    """
+    global _classificador
+    _classificador = fn
+
+def classificar_por_regra(user_input: str):
+    """
+    Regras locais: True/False quando a regra decide, None quando é ambíguo.
+    """
+    texto = _normalizar(user_input)
+    if not texto:
+        return False
+
+    if any(frase in texto for frase in FRASES_NOVO_TOPICO):
+        return True
+
+    # partial_ratio só é conclusivo quando a frase cabe na mensagem; mensagens
+    # curtas ("mudar", "outro") no máximo ficam na faixa ambígua
+    scores = bulk_partial_ratio(texto, FRASES_NOVO_TOPICO, FUZZY_CONTINUAR)
+    cabe = np.array([len(f) <= len(texto) for f in FRASES_NOVO_TOPICO])
+    if cabe.any() and scores[cabe].max() >= FUZZY_NOVO:
+        return True
+    if scores.max() < FUZZY_CONTINUAR:
+        return False
+    return None
+
+def detectar_mudanca_topico(user_input, current_context, instructions_df, username="USUARIO"):
+    """
+    Mesmo contrato de analyze_context_with_gpt -> (is_new_topic, feedback),
+    mas decide localmente e só chama o LLM quando regra e classificador
+    não têm certeza.
+    """
+    decisao = classificar_por_regra(user_input)
+    if decisao is not None:
+        estatisticas.registrar("regra")
+        return decisao, FEEDBACK_NOVO if decisao else FEEDBACK_CONTINUAR
+
+    if _classificador is not None:
+        texto = _normalizar(user_input)
+        prob = _classificador(texto)
+        novo = prob >= CLASSIF_NOVO and len(texto.split()) >= CLASSIF_MIN_PALAVRAS
+        if novo or prob <= CLASSIF_CONTINUAR:
+            estatisticas.registrar("classificador")
+            return novo, FEEDBACK_NOVO if novo else FEEDBACK_CONTINUAR
+
+    estatisticas.registrar("llm")
+    contadores = estatisticas.como_dict()
+    print(
+        f"[Chat] Mudança de tópico escalada ao LLM ({contadores['escalonadas']} de "
+        f"{contadores['total']} mensagens, {100 * estatisticas.taxa_escalonamento():.1f}%)."
+    )
+    return analyze_context_with_gpt(user_input, current_context, instructions_df, username=username)
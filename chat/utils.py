@@ -1,4 +1,8 @@
 import re
+import threading
+import weakref
+
+import pandas as pd
 
 def remove_punct_lower(s: str) -> str:
     """Remove pontuações e converte para minúsculo."""
@@ -7,29 +11,64 @@ def remove_punct_lower(s: str) -> str:
     s = re.sub(r"\s+", " ", s).strip()
     return s
 
-def safe_to_float(s: str):
-    """Converte string monetária ou numérica para float com segurança."""
-    try:
-        return float(s.replace('.', '').replace(',', ''))
-    except:
-        try:
-            return float(s)
-        except:
-            return None
-
-def format_currency(s: str) -> str:
-    val = safe_to_float(s)
-    if val is not None:
-        return f"R$ {val:,.2f}"
-    return s
+def fingerprint_df(df: pd.DataFrame):
+    """Hash vetorizado do conteúdo do DataFrame (identifica a 'versão' do CSV)."""
+    hashes = pd.util.hash_pandas_object(df, index=True)
+    return (tuple(df.columns), len(df), int(hashes.sum()))
 
-def format_percentage(s: str) -> str:
-    """Formata strings como '87%' -> '87%'."""
-    s = s.strip()
-    if s.endswith('%'):
-        try:
-            num = float(s[:-1].strip())
-            return f"{num:.0f}%"
-        except:
-            return s
-    return s
+def assinatura_indice(index: pd.Index):
+    """Identifica as linhas de um DataFrame: O(1) para RangeIndex, hash para os demais."""
+    if isinstance(index, pd.RangeIndex):
+        return ("range", index.start, index.stop, index.step)
+    return ("hash", len(index), int(pd.util.hash_pandas_object(index, index=False).sum()))
+
+class CachePorDataFrame:
+    """
+    Guarda as estruturas derivadas de um DataFrame (índices, modelo tipado...)
+    por versão do conteúdo: só chama 'construtor' quando o CSV mudou.
+    O mesmo objeto DataFrame reaproveita o resultado sem recalcular o hash;
+    DataFrames vindos de chat.loaders trazem a versão em df.attrs["versao"];
+    como o pandas copia attrs para recortes (df[mascara]), a chave também
+    leva a assinatura do índice, e um recorte ganha a sua própria entrada.
+    """
+
+    def __init__(self, construtor, maximo: int = 8):
+        self.construtor = construtor
+        self.maximo = maximo
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._ultimo = (lambda: None, None)
+
+    def obter(self, df: pd.DataFrame):
+        with self._lock:
+            ref, valor = self._ultimo
+        if ref() is df:
+            return valor
+
+        # Versão do carregador (hash do arquivo) quando houver; senão o hash do conteúdo
+        versao = df.attrs.get("versao")
+        chave = (versao, assinatura_indice(df.index)) if versao else fingerprint_df(df)
+        with self._lock:
+            valor = self._cache.get(chave)
+        if valor is None:
+            valor = self.construtor(df)
+            with self._lock:
+                if len(self._cache) >= self.maximo:
+                    self._cache.pop(next(iter(self._cache)))
+                self._cache[chave] = valor
+
+        with self._lock:
+            self._ultimo = (weakref.ref(df), valor)
+        return valor
+
+def format_currency_valor(val: float, bruto: str = "") -> str:
+    """Formata um valor já convertido (ver kb_model); NaN devolve o texto original."""
+    if val is None or val != val:
+        return bruto
+    return f"R$ {val:,.2f}"
+
+def format_percentage_valor(val: float, bruto: str = "") -> str:
+    """Percentual em pontos (24.0 -> '24%'); NaN devolve o texto original."""
+    if val is None or val != val:
+        return bruto
+    return f"{val:.0f}%"
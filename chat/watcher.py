@@ -0,0 +1,88 @@
+import os
+import logging
+import threading
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # sem watchdog, vale a checagem de stat a cada pergunta (chat.loaders)
+    Observer = None
+    FileSystemEventHandler = object
+
+logger = logging.getLogger(__name__)
+
+# A macro do Excel grava o CSV em várias etapas; espera o arquivo "assentar"
+DEBOUNCE_SEGUNDOS = 1.0
+TENTATIVAS_RECARGA = 3
+# Abrir/fechar (inclusive a nossa própria leitura) não conta como mudança
+EVENTOS_ESCRITA = {"created", "modified", "moved", "deleted", "closed"}
+
+class _EventosCSV(FileSystemEventHandler):
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.is_directory or event.event_type not in EVENTOS_ESCRITA:
+            return
+        caminhos = [getattr(event, "src_path", ""), getattr(event, "dest_path", "")]
+        if any(os.path.abspath(c) in self.watcher.arquivos for c in caminhos if c):
+            self.watcher.agendar_recarga()
+
+class KBWatcher:
+    """
+    Observa knowledge_base.csv/instructions.csv (watchdog) e, quando mudam,
+    recarrega e reindexa o store numa thread de fundo, uma única vez por
+    rajada de eventos. A pergunta seguinte de qualquer sessão já encontra
+    a nova versão pronta, sem pagar a recarga.
+    """
+
+    def __init__(self, store, arquivos: list, debounce: float = DEBOUNCE_SEGUNDOS):
+        self.store = store
+        self.arquivos = {os.path.abspath(a) for a in arquivos}
+        self.debounce = debounce
+        self._timer = None
+        self._lock = threading.Lock()
+        self._observer = None
+
+    def iniciar(self) -> bool:
+        if Observer is None:
+            logger.info("watchdog indisponível: KB recarregada pela checagem de stat.")
+            return False
+        observer = Observer()
+        handler = _EventosCSV(self)
+        for pasta in {os.path.dirname(a) for a in self.arquivos}:
+            observer.schedule(handler, pasta, recursive=False)
+        observer.daemon = True
+        observer.start()
+        self._observer = observer
+        return True
+
+    def parar(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
+
+    def agendar_recarga(self, tentativa: int = 1):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.debounce, self._recarregar, args=(tentativa,))
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _recarregar(self, tentativa: int):
+        anterior = self.store.versao
+        try:
+            snapshot = self.store.snapshot()
+        except Exception:  # arquivo ainda travado/incompleto pelo Excel: tenta de novo
+            if tentativa < TENTATIVAS_RECARGA:
+                self.agendar_recarga(tentativa + 1)
+            else:
+                logger.exception("Falha ao recarregar a base do chat.")
+            return
+        if snapshot.versao != anterior:
+            logger.info("Base do chat recarregada em segundo plano: %s", snapshot.versao)
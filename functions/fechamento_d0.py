@@ -1,5 +1,4 @@
 import os
-import json
 import sys
 import time
 import streamlit as st
@@ -19,35 +18,33 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
 # Ajuste se necessário (caso constants.py esteja em outro lugar)
-from app.constants import CONFIG_FILE
+from app.constants import AVISO_CONFIG_EM_USO, CONFIG_FILE, ESPERA_CONFIG_MANUAL
+from utils.rotinas_config import ConfigEmUso, config_isolada
+from utils.run_history import Execucao
 
-def executar_fechamento_d0():
+def executar_fechamento_d0(tarefa: str = "fechamento_d0"):
     """
     Fluxo Fechamento D-0:
-      1) Ativa somente '03013604' no rotinas_config.json, desativa as demais.
-      2) Executa main.py (Promax) e aguarda a conclusão.
+      1) Monta uma cópia do rotinas_config.json só com '03013604' ativa
+         (passada ao main.py via ROTINAS_CONFIG_PATH).
+      2) Executa main.py (Promax) e aguarda a conclusão; ao terminar, apaga a
+         cópia (no modo compat, também restaura o rotinas_config.json).
       3) Atualiza planilha GC.
       4) Localiza a imagem mais recente e envia via WhatsApp (Selenium).
-      5) Restaura rotinas_config.json.
+
+    Vai para o histórico de execuções como 'tarefa' (gatilho manual), a
+    partir do início do main.py: a espera pelo rotinas_config.json fica fora.
     """
     st.info("Iniciando fluxo: Rotina 03013604 + Fechamento D-0...")
 
-    backup_config = None
+    execucao = None
+    returncode = None
+    erro_execucao = None
     try:
-        # --------------------- 1) Override rotinas_config.json ---------------------
+        # --------------------- 1) Config desta execução ---------------------
         if not os.path.exists(CONFIG_FILE):
             st.error(f"Arquivo de configuração não encontrado: {CONFIG_FILE}")
             return
-        
-        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-            backup_config = json.load(f)
-
-        # Desativa todas as rotinas exceto a 03013604
-        config_override = {key: False for key in backup_config.keys()}
-        config_override["03013604"] = True
-
-        with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-            json.dump(config_override, f, indent=4)
 
         # --------------------- 2) Executar main.py (Promax) ---------------------
         st.write("Executando main.py para rodar a rotina 03013604...")
@@ -55,13 +52,20 @@ def executar_fechamento_d0():
             r"\\192.168.1.213\Administrativo\TecInfo\Automacoes\Guilherme\Promax\main.py"
         )
 
-        result = subprocess.run(
-            [sys.executable, "-u", caminho_main],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            encoding="utf-8"
-        )
+        # Desativa todas as rotinas exceto a 03013604 (cópia apagada ao sair)
+        with config_isolada(CONFIG_FILE, {"__all__": False, "03013604": True},
+                            timeout=ESPERA_CONFIG_MANUAL) as env:
+            execucao = Execucao(tarefa, "manual")
+            result = subprocess.run(
+                [sys.executable, "-u", caminho_main],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                encoding="utf-8",
+                env=env
+            )
+
+        returncode = result.returncode
 
         # Exibe logs no Streamlit
         st.text("===== LOG main.py =====")
@@ -122,15 +126,14 @@ def executar_fechamento_d0():
         except Exception as e:
             st.error(f"Erro ao enviar a imagem para o WhatsApp: {e}")
 
+    except ConfigEmUso:
+        st.warning(AVISO_CONFIG_EM_USO)
     except Exception as e:
+        erro_execucao = f"{type(e).__name__}: {e}"
         st.error(f"Erro no processo Fechamento D-0: {e}")
-
     finally:
-        # --------------------- 5) Restaura o rotinas_config.json ---------------------
-        if backup_config is not None:
-            with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-                json.dump(backup_config, f, indent=4)
-            st.info("Configurações restauradas no rotinas_config.json")
+        if execucao is not None:
+            execucao.finalizar(returncode, None, erro_execucao)
 
 
 def enviar_imagem_whatsapp_selenium(caminho_imagem: str, nome_grupo: str):
@@ -2,24 +2,29 @@
 
 import streamlit as st
 import pandas as pd
-import os
 from utils.credits import show_credits
+from utils import kb_backend
+from utils.kb_search import get_indice_busca
+from utils.kb_paginacao import tabela_paginada, rotulos
 
 CSV_PATH = "knowledge_base.csv"
 
 def load_csv():
-    if os.path.exists(CSV_PATH):
-        df = pd.read_csv(CSV_PATH, delimiter=";", encoding="ISO-8859-1")
-        return df
-    else:
-        return pd.DataFrame(columns=[
-            "categoria","subcategoria","indicador","meta","real",
-            "percentual_atual","melhores_vendedores","piores_vendedores",
-            "dias_faltantes","data_atualizacao","fonte"
-        ])
-
-def save_csv(data):
-    data.to_csv(CSV_PATH, index=False, sep=";", encoding="ISO-8859-1")
+    # CSV + journal de edições, ou SQLite com KB_BACKEND=sqlite (ver utils/kb_backend.py)
+    data, versao = kb_backend.carregar(CSV_PATH, colunas=[
+        "categoria","subcategoria","indicador","meta","real",
+        "percentual_atual","melhores_vendedores","piores_vendedores",
+        "dias_faltantes","data_atualizacao","fonte"
+    ])
+    data.attrs["versao"] = versao  # chave do índice de busca
+    return data
+
+def registrar_edicao(op, categoria, indicador, dados=None):
+    """
+    Grava a inclusão/edição/remoção no journal em vez de regravar o CSV:
+    duas pessoas salvando ao mesmo tempo não perdem as alterações uma da outra.
+    """
+    kb_backend.registrar(CSV_PATH, op, kb_backend.id_linha(categoria, indicador), dados)
 
 def export_data(data, format):
     if format == "CSV":
@@ -44,19 +49,19 @@ def main():
     # Exibir tabela ou filtrar
     st.subheader("Buscar na Base de Conhecimento")
     search_query = st.text_input("Digite sua busca")
-    if search_query:
-        for col in ["categoria", "subcategoria", "indicador", "fonte"]:
-            if col in data.columns:
-                data[col] = data[col].astype(str)
-        filtered_data = data[
-            data["categoria"].str.contains(search_query, case=False, na=False)
-            | data["subcategoria"].str.contains(search_query, case=False, na=False)
-            | data["indicador"].str.contains(search_query, case=False, na=False)
-            | data["fonte"].str.contains(search_query, case=False, na=False)
-        ]
-        st.dataframe(filtered_data)
-    else:
-        st.dataframe(data)
+    # Índice por versão da base: sem acento, por prefixo, ordenado por relevância
+    posicoes = get_indice_busca(data).buscar(search_query) if search_query else None
+    # Filtro por fonte (no SQLite, pelo índice de fonte do banco)
+    fontes = sorted({str(f).strip() for f in data["fonte"].dropna() if str(f).strip()})
+    fonte = st.selectbox("Fonte", ["Todas"] + fontes)
+    if fonte != "Todas":
+        da_fonte = [p for p in kb_backend.por_fonte(CSV_PATH, fonte, data).index if p < len(data)]
+        if posicoes is not None:
+            na_fonte = set(da_fonte)
+            da_fonte = [p for p in posicoes if p in na_fonte]
+        posicoes = da_fonte
+    # Só a página atual vai para o navegador
+    visiveis = tabela_paginada(data, posicoes)
 
     # Exemplo: Formulário para adicionar
     st.subheader("\u2795 Adicionar Nova Informação")
@@ -68,17 +73,30 @@ def main():
         new_real = st.number_input("Realizado", min_value=0, step=1)
         # ...
         submitted = st.form_submit_button("Adicionar")
-        if submitted:
-            # salva no DF e no CSV ...
-            pass
+        if submitted and not (new_category.strip() and new_indicator.strip()):
+            st.error("Preencha a categoria e o indicador.")
+        elif submitted:
+            try:
+                registrar_edicao("insert", new_category, new_indicator, {
+                    "categoria": new_category,
+                    "subcategoria": new_subcategory,
+                    "indicador": new_indicator,
+                    "meta": new_meta,
+                    "real": new_real,
+                })
+                st.success("Nova entrada adicionada com sucesso!")
+            except ValueError as e:
+                st.error(str(e))
 
     # Exemplo: Edição/Remoção
     st.subheader("\u270F\ufe0f Editar ou Remover Informações")
     if not data.empty and "indicador" in data.columns:
+        # Opções e rótulos só das linhas da página exibida acima
+        nomes = rotulos(data, visiveis)
         selected_index = st.selectbox(
             "Selecione a entrada para editar ou remover",
-            data.index,
-            format_func=lambda x: f"{data.iloc[x]['categoria']} - {data.iloc[x]['indicador']}"
+            visiveis,
+            format_func=nomes.get
         )
         if selected_index is not None:
             # Exemplo de pegar valor numérico
@@ -90,15 +108,21 @@ def main():
 
             # ...
             if st.button("Salvar Alterações"):
-                data.at[selected_index, "meta"] = meta_to_edit
-                data.at[selected_index, "real"] = real_to_edit
-                # ...
-                save_csv(data)
-                st.success("Alterações salvas com sucesso!")
+                # Só os campos que mudaram em relação ao que o formulário mostrou:
+                # 'real' em texto (ex.: série mensal) aparece como 0 e não é
+                # sobrescrito se o usuário não mexer nele
+                alterados = kb_backend.campos_alterados(
+                    {"meta": meta_val, "real": real_val},
+                    {"meta": meta_to_edit, "real": real_to_edit},
+                )
+                if alterados:
+                    registrar_edicao("update", data.at[selected_index, "categoria"], data.at[selected_index, "indicador"], alterados)
+                    st.success("Alterações salvas com sucesso!")
+                else:
+                    st.info("Nenhuma alteração para salvar.")
 
             if st.button("Remover Entrada"):
-                data = data.drop(index=selected_index).reset_index(drop=True)
-                save_csv(data)
+                registrar_edicao("delete", data.at[selected_index, "categoria"], data.at[selected_index, "indicador"])
                 st.success("Entrada removida com sucesso!")
     else:
         st.info("A base de dados está vazia ou sem coluna 'indicador'.")
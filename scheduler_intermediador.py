@@ -8,6 +8,20 @@ from datetime import datetime
 from typing import Dict, Any
 import threading
 import traceback
+from contextlib import nullcontext
+
+from utils.state_files import gravar_json, ler_json
+from utils.rotinas_config import config_isolada
+from utils.task_executor import ExecutorTarefas, INICIADA
+from utils.run_history import registrar_execucao
+from utils.output_pump import LogBufferizado, bombear_saida
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # sem watchdog, o loop confere o mtime a cada segundo
+    Observer = None
+    FileSystemEventHandler = object
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 LOG_DIRECTORY = os.path.join(BASE_DIR, "logs")
@@ -18,6 +32,14 @@ os.makedirs(LOG_DIRECTORY, exist_ok=True)
 
 # Tempo mínimo entre execuções (em segundos)
 INTERVALO_MINIMO = 30
+# Sem watchdog: intervalo do stat no schedule_config.json (só metadados, sem abrir o arquivo)
+INTERVALO_STAT = 1.0
+# Com watchdog: confere o stat mesmo assim de tempos em tempos (eventos em
+# compartilhamento de rede podem se perder)
+INTERVALO_STAT_WATCHDOG = 60.0
+HEARTBEAT_SEGUNDOS = 480
+# Execuções simultâneas no total (cada tarefa ainda tem o seu limite em TASKS)
+MAX_WORKERS = int(os.getenv("SCHEDULER_MAX_WORKERS", "2"))
 # Dicionário que manterá o "momento" da última execução de cada tarefa
 ultima_execucao_ts: Dict[str, float] = {}
 
@@ -37,11 +59,9 @@ def carregar_horario() -> Dict[str, Any]:
     """Lê o schedule_config.json e retorna como dicionário."""
     if os.path.exists(SCHEDULE_FILE):
         try:
-            with open(SCHEDULE_FILE, "r", encoding="utf-8") as f:
-                content = f.read().strip()
-                if not content:
-                    raise ValueError("Arquivo JSON está vazio.")
-                return json.loads(content)
+            # O app grava de forma atômica (utils/state_files.py): o arquivo
+            # lido aqui está sempre completo, mesmo relendo a cada segundo
+            return ler_json(SCHEDULE_FILE)
         except (json.JSONDecodeError, ValueError) as e:
             registrar_log("scheduler_fatal.log", f"Erro ao carregar agendamento: {e}")
             # Retorna config padrão
@@ -57,8 +77,7 @@ def carregar_horario() -> Dict[str, Any]:
             "tarefas": [],
             "ultima_modificacao": ""
         }
-        with open(SCHEDULE_FILE, "w", encoding="utf-8") as f:
-            json.dump(config_padrao, f, indent=4)
+        gravar_json(SCHEDULE_FILE, config_padrao, bloquear=True)
         return config_padrao
 
 def imprimir_proxima_execucao():
@@ -80,6 +99,7 @@ TASKS = {
         "label": "Script Principal (main.py)",
         "script": r"\\192.168.1.213\Administrativo\TecInfo\Automacoes\Guilherme\Promax\main.py",
         "override_config": None,
+        "rotinas_config": True,
         "log_file": "script_principal.log",
     },
     "criticas_rn": {
@@ -89,6 +109,7 @@ TASKS = {
             "__all__": False,
             "030111": True
         },
+        "rotinas_config": True,
         "log_file": "criticas_rn.log",
     },
     "atualizar_faturamento": {
@@ -105,37 +126,15 @@ TASKS = {
     },
     # ...
 }
+# "rotinas_config": True nas tarefas cujo script lê o rotinas_config.json
+# (recebem a cópia com o override; ver utils/rotinas_config.py)
+# Opcional em cada tarefa: "max_concorrencia" (padrão 1) e "politica"
+# ("skip" | "queue" | "coalesce", padrão "coalesce") para quando o horário
+# chega com a tarefa ainda rodando (ver utils/task_executor.py)
 
-###############################################################################
-# Manipulação de Config
-###############################################################################
-def aplicar_override_config(override: dict):
-    """Aplica uma configuração temporária no rotinas_config.json."""
-    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-        original = json.load(f)
-    backup = dict(original)
-
-    if override is not None:
-        if "__all__" in override:
-            set_all = override["__all__"]
-            for k in backup.keys():
-                backup[k] = bool(set_all)
-            del override["__all__"]
-
-        for k, v in override.items():
-            backup[k] = v
-
-    with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-        json.dump(backup, f, indent=4)
-
-    return original
-
-def restaurar_config(config_anterior: dict):
-    """Restaura a configuração original no rotinas_config.json."""
-    if config_anterior is None:
-        return
-    with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-        json.dump(config_anterior, f, indent=4)
+EXECUTOR = ExecutorTarefas(max_workers=MAX_WORKERS, politica_padrao="coalesce")
+for _nome, _info in TASKS.items():
+    EXECUTOR.configurar(_nome, _info.get("max_concorrencia", 1), _info.get("politica"))
 
 ###############################################################################
 # Execução das tarefas em Thread separada
@@ -180,40 +179,40 @@ def executar_tarefa(nome_tarefa: str):
     label = info["label"]
     script_path = info["script"]
     override = info.get("override_config")
+    le_config = info.get("rotinas_config", False)
     log_file = info["log_file"]
 
     registrar_log(log_file, f"[Scheduler] Iniciando {label} ...")
 
-    config_backup = None
     try:
-        if override:
-            config_backup = aplicar_override_config(override)
-
-        # Vamos ler a saída sem travar o loop do schedule
-        # - Se quiser travar, pode remover a thread, mas arrisca congelar run_pending()
-        proc = subprocess.Popen(
-            [sys.executable, "-u", script_path],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            encoding="utf-8",
-            errors="replace"
-        )
-
-        caminho_log = os.path.join(LOG_DIRECTORY, log_file)
-
-        # Em vez de bloquear lendo linha por linha, vamos ler até o fim de forma "não bloqueante"
-        # Poderíamos usar select, mas algo simples é ler chunk a chunk (polling)
-        while True:
-            retcode = proc.poll()
-            line = proc.stdout.readline()
-            if line:
-                line = line.rstrip("\n")
-                registrar_log(log_file, line)
-            if retcode is not None:
-                # Processo terminou
-                break
-            time.sleep(0.5)
+        # Cada execução recebe a sua cópia do rotinas_config.json (com o
+        # override da tarefa) via ROTINAS_CONFIG_PATH. No modo compat (padrão,
+        # até o main.py ler essa variável) o override também vai para o arquivo
+        # compartilhado e as execuções com override ficam em série; ver
+        # utils/rotinas_config.py. As demais tarefas rodam com o ambiente atual.
+        # A execução entra no histórico só depois dessa espera
+        ambiente = config_isolada(CONFIG_FILE, override) if le_config else nullcontext(dict(os.environ))
+        with ambiente as env, registrar_execucao(nome_tarefa, "agendado") as execucao:
+            # A saída é lida por uma thread em blocos, assim que chega, e vai
+            # para o log em lote (utils/output_pump.py); aqui só esperamos o fim
+            proc = subprocess.Popen(
+                [sys.executable, "-u", script_path],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                env=env,
+            )
+            execucao.acompanhar(proc)
+
+            caminho_log = os.path.join(LOG_DIRECTORY, log_file)
+
+            with LogBufferizado(caminho_log) as log:
+                bomba = bombear_saida(proc, log)
+                proc.wait()
+                # Se o script deixou algum filho com o pipe aberto, não trava aqui
+                bomba.join(timeout=10)
+            execucao.finalizar(proc.returncode, bomba.bytes_lidos)
+        if bomba.erro is not None:
+            registrar_log(log_file, f"Erro ao ler a saída de {label}: {bomba.erro}")
 
         if proc.returncode == 0:
             registrar_log(log_file, f"{label} finalizado com sucesso. [returncode=0]")
@@ -223,22 +222,17 @@ def executar_tarefa(nome_tarefa: str):
     except Exception as e:
         registrar_log(log_file, f"Erro ao executar {label}: {e}\n{traceback.format_exc()}")
 
-    finally:
-        if override:
-            restaurar_config(config_backup)
-
 def criar_funcao_agendamento(nome_tarefa: str):
     """
-    Retorna uma função que chama 'thread_executar_tarefa' em background.
+    Retorna uma função que entrega 'thread_executar_tarefa' ao EXECUTOR
+    (roda em background, respeitando o limite global e o da tarefa).
     """
     def _func():
-        # Dispara em thread para não bloquear o schedule
-        th = threading.Thread(
-            target=thread_executar_tarefa, 
-            args=(nome_tarefa,),
-            daemon=True  # Daemon thread
-        )
-        th.start()
+        resultado = EXECUTOR.submeter(nome_tarefa, thread_executar_tarefa, nome_tarefa)
+        if resultado != INICIADA:
+            registrar_log("scheduler.log",
+                f"[Scheduler] Disparo de '{nome_tarefa}' {resultado} "
+                f"(fila da tarefa: {EXECUTOR.profundidade_fila(nome_tarefa)}, fila total: {EXECUTOR.profundidade_fila()}).")
     _func.__name__ = f"executar_{nome_tarefa}"
     return _func
 
@@ -279,43 +273,122 @@ def atualizar_agendamentos():
 
     imprimir_proxima_execucao()
 
+###############################################################################
+# Observação do schedule_config.json
+###############################################################################
+def assinatura_arquivo(caminho: str):
+    """(mtime, tamanho) do arquivo, ou None se não existe."""
+    try:
+        st = os.stat(caminho)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+class _EventosConfig(FileSystemEventHandler):
+    def __init__(self, caminho: str, evento: threading.Event):
+        self.caminho = os.path.normcase(os.path.abspath(caminho))
+        self.evento = evento
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        # Gravação atômica chega como 'moved' (temporário -> schedule_config.json)
+        for c in (getattr(event, "src_path", ""), getattr(event, "dest_path", "")):
+            if c and os.path.normcase(os.path.abspath(c)) == self.caminho:
+                self.evento.set()
+                return
+
+class ObservadorConfig:
+    """
+    Acorda o loop quando o schedule_config.json muda. Usa watchdog quando
+    disponível; senão (ou se ele não subir, ex.: pasta de rede sem suporte),
+    o loop faz só um stat por segundo.
+    """
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self.mudou = threading.Event()
+        self.observer = None
+
+    def iniciar(self) -> bool:
+        if Observer is None:
+            return False
+        try:
+            observer = Observer()
+            observer.schedule(_EventosConfig(self.caminho, self.mudou),
+                              os.path.dirname(os.path.abspath(self.caminho)), recursive=False)
+            observer.daemon = True
+            observer.start()
+        except Exception as e:
+            registrar_log("scheduler.log", f"[Scheduler] watchdog indisponível ({e}); usando stat a cada {INTERVALO_STAT:.0f}s.")
+            return False
+        self.observer = observer
+        return True
+
+    @property
+    def intervalo_stat(self) -> float:
+        return INTERVALO_STAT_WATCHDOG if self.observer is not None else INTERVALO_STAT
+
+    def esperar(self, segundos: float):
+        """Dorme até 'segundos' ou até o arquivo mudar (o que vier primeiro)."""
+        if self.mudou.wait(max(0.0, segundos)):
+            self.mudou.clear()
+
 ###############################################################################
 # Loop Principal
 ###############################################################################
 def monitorar_agendador():
     """
     Loop principal:
-    - Verifica mudanças em schedule_config.json
-    - Recarrega agendamentos se 'ultima_modificacao' foi alterado
+    - Dorme até o próximo job (schedule.idle_seconds) ou até o
+      schedule_config.json mudar (watchdog; sem ele, stat a cada 1s)
+    - Só relê o JSON quando (mtime, tamanho) do arquivo mudam, e recarrega
+      os agendamentos se 'ultima_modificacao' foi alterado
     - Executa schedule.run_pending()
-    - Imprime heartbeat a cada 30s pra sabermos se está vivo
+    - Imprime heartbeat periódico pra sabermos se está vivo
     """
     print("[Scheduler] Iniciando monitor do agendador...")
     registrar_log("scheduler.log", "[Scheduler] monitorar_agendador iniciado.")
     ultima_modificacao_anterior = None
-    heartbeat_counter = 0
+    assinatura_anterior = False  # força a primeira leitura
+    proximo_heartbeat = time.time() + HEARTBEAT_SEGUNDOS
+
+    observador = ObservadorConfig(SCHEDULE_FILE)
+    if observador.iniciar():
+        registrar_log("scheduler.log", "[Scheduler] Observando schedule_config.json via watchdog.")
 
     while True:
         try:
-            config = carregar_horario()
-            ultima_modificacao = config.get("ultima_modificacao", "")
-
-            if ultima_modificacao != ultima_modificacao_anterior:
-                registrar_log("scheduler.log", 
-                    f"[Scheduler] Detecção de alteração em schedule_config.json (ultima_modificacao={ultima_modificacao})."
-                )
-                atualizar_agendamentos()
-                ultima_modificacao_anterior = ultima_modificacao
+            assinatura = assinatura_arquivo(SCHEDULE_FILE)
+            if assinatura != assinatura_anterior:
+                # Assinatura de antes da leitura: se o arquivo mudar durante
+                # ela, a próxima volta relê
+                assinatura_anterior = assinatura
+                config = carregar_horario()
+                ultima_modificacao = config.get("ultima_modificacao", "")
+
+                if ultima_modificacao != ultima_modificacao_anterior:
+                    registrar_log("scheduler.log", 
+                        f"[Scheduler] Detecção de alteração em schedule_config.json (ultima_modificacao={ultima_modificacao})."
+                    )
+                    atualizar_agendamentos()
+                    ultima_modificacao_anterior = ultima_modificacao
 
             schedule.run_pending()
 
-            # Heartbeat a cada 30s, pra ver que não congelou
-            heartbeat_counter += 1
-            if heartbeat_counter >= 480:
-                heartbeat_counter = 0
-                registrar_log("scheduler_heartbeat.log", "[Scheduler] still alive...")
-
-            time.sleep(1)
+            # Heartbeat periódico, pra ver que não congelou
+            if time.time() >= proximo_heartbeat:
+                proximo_heartbeat = time.time() + HEARTBEAT_SEGUNDOS
+                total = EXECUTOR.estatisticas()["__total__"]
+                registrar_log("scheduler_heartbeat.log",
+                    f"[Scheduler] still alive... (rodando: {total['ocupados']}/{total['workers']}, na fila: {total['na_fila']})")
+
+            espera = observador.intervalo_stat
+            ate_proximo_job = schedule.idle_seconds()
+            if ate_proximo_job is not None:
+                espera = min(espera, ate_proximo_job)
+            espera = min(espera, proximo_heartbeat - time.time())
+            observador.esperar(espera)
 
         except Exception as e:
             # Se algo der errado no loop, vamos logar e continuar
@@ -0,0 +1,66 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from chat import llm
+
+RESPOSTA = {
+    "id": "teste", "object": "chat.completion", "created": 0, "model": "gpt-4o-mini",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+}
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        # Porta de origem do cliente: uma por conexão TCP
+        self.server.conexoes.append(self.client_address)
+        self.rfile.read(int(self.headers.get("content-length", 0)))
+        corpo = json.dumps(RESPOSTA).encode()
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+@pytest.fixture
+def servidor():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    srv.conexoes = []
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    llm.fechar_clientes()
+    yield srv
+    llm.fechar_clientes()
+    srv.shutdown()
+    srv.server_close()
+
+def test_get_llm_reaproveita_cliente_e_conexao(servidor):
+    base_url = f"http://127.0.0.1:{servidor.server_address[1]}/v1"
+
+    respostas = []
+    for _ in range(3):
+        cliente = llm.get_llm(base_url=base_url, api_key="teste", max_retries=0)
+        respostas.append(cliente.invoke("oi").content)
+
+    assert respostas == ["ok", "ok", "ok"]
+    assert llm.get_llm(base_url=base_url, api_key="teste", max_retries=0) is cliente
+    # As 3 chamadas chegaram pela mesma conexão TCP (mesma porta de origem)
+    assert len(servidor.conexoes) == 3
+    assert len(set(servidor.conexoes)) == 1
+
+def test_clientes_diferentes_compartilham_o_pool(servidor):
+    base_url = f"http://127.0.0.1:{servidor.server_address[1]}/v1"
+
+    frio = llm.get_llm(temperature=0.0, base_url=base_url, api_key="teste", max_retries=0)
+    quente = llm.get_llm(temperature=0.7, base_url=base_url, api_key="teste", max_retries=0)
+    assert frio is not quente
+
+    frio.invoke("oi")
+    quente.invoke("oi")
+    assert len(set(servidor.conexoes)) == 1
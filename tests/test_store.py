@@ -0,0 +1,64 @@
+import os
+import shutil
+import tracemalloc
+
+import pytest
+
+from chat.store import KBStore, SnapshotKB
+from utils import kb_backend
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # BACKEND é lido no import: fixa o módulo, não a variável de ambiente
+    monkeypatch.setattr(kb_backend, "BACKEND", "csv")
+    for nome in ("knowledge_base.csv", "instructions.csv"):
+        shutil.copy(os.path.join(RAIZ, nome), tmp_path / nome)
+    return KBStore(str(tmp_path / "knowledge_base.csv"), str(tmp_path / "instructions.csv"))
+
+def test_leituras_devolvem_os_mesmos_objetos(store):
+    primeira = store.snapshot()
+    for _ in range(5):
+        foto = store.snapshot()
+        assert foto is primeira
+        assert foto.knowledge_base is primeira.knowledge_base
+        assert foto.instructions is primeira.instructions
+        assert foto.kb_model is primeira.kb_model
+        assert foto.matcher_index is primeira.matcher_index
+
+def test_leitura_nao_copia_o_dataframe(store):
+    foto = store.snapshot()
+    tamanho_df = int(foto.knowledge_base.memory_usage(deep=True).sum())
+
+    tracemalloc.start()
+    try:
+        antes = tracemalloc.take_snapshot()
+        fotos = [store.snapshot() for _ in range(50)]
+        depois = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    alocado = sum(d.size_diff for d in depois.compare_to(antes, "filename") if d.size_diff > 0)
+    assert all(f is foto for f in fotos)
+    # 50 leituras alocam menos que uma única cópia do DataFrame
+    assert alocado < tamanho_df
+
+def test_foto_e_somente_leitura(store):
+    foto = store.snapshot()
+    with pytest.raises(AttributeError):
+        foto.knowledge_base = None
+
+def test_recarga_cria_outra_foto_sem_alterar_a_antiga(store):
+    antiga = store.snapshot()
+    df_antigo = antiga.knowledge_base
+
+    with open(store.kb_path, "a", encoding="ISO-8859-1") as f:
+        f.write("KPI;Teste;Indicador Novo;100;50;50%;;;10;01/01/2025;Teste\n")
+
+    nova = store.snapshot()
+    assert isinstance(nova, SnapshotKB)
+    assert nova is not antiga
+    assert len(nova.knowledge_base) == len(df_antigo) + 1
+    assert antiga.knowledge_base is df_antigo
+    assert store.snapshot() is nova
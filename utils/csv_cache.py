@@ -0,0 +1,101 @@
+# csv_cache.py
+#
+# Cache "sidecar" em Arrow IPC para os CSVs da base (knowledge_base.csv,
+# instructions.csv). O CSV continua sendo a fonte; o .arrow fica em .cache/
+# ao lado dele e é regenerado quando o CSV muda.
+
+import io
+import os
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # sem pyarrow, lê sempre o CSV
+    pa = None
+
+CACHE_DIRNAME = ".cache"
+VERSAO_FORMATO = "1"
+
+def caminho_sidecar(csv_path: str) -> str:
+    pasta, nome = os.path.split(os.path.abspath(csv_path))
+    return os.path.join(pasta, CACHE_DIRNAME, nome + ".arrow")
+
+def _ler_sidecar(caminho: str):
+    """(tabela, metadados) do .arrow aberto com memory-map, ou (None, {}) se não der."""
+    try:
+        with pa.memory_map(caminho, "r") as fonte:
+            tabela = pa.ipc.open_file(fonte).read_all()
+    except (OSError, pa.ArrowInvalid):
+        return None, {}
+    meta = {k.decode(): v.decode() for k, v in (tabela.schema.metadata or {}).items()}
+    if meta.get("formato") != VERSAO_FORMATO:
+        return None, {}
+    return tabela, meta
+
+def _gravar_sidecar(caminho: str, tabela, meta: dict):
+    tabela = tabela.replace_schema_metadata({k: str(v) for k, v in meta.items()})
+    try:
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        tmp = f"{caminho}.{os.getpid()}.tmp"
+        with pa.OSFile(tmp, "wb") as destino:
+            with pa.ipc.new_file(destino, tabela.schema) as writer:
+                writer.write_table(tabela)
+        os.replace(tmp, caminho)
+    except OSError:
+        pass  # sem permissão ou arquivo em uso (Windows): fica só sem cache
+
+def _para_pandas(tabela) -> pd.DataFrame:
+    df = tabela.to_pandas()
+    # Arrow devolve None nas colunas de texto; o read_csv devolvia NaN
+    for i, col in enumerate(df.columns):
+        if tabela.column(i).null_count and df[col].dtype == object:
+            valores = df[col].to_numpy(copy=True)
+            valores[pd.isna(valores)] = np.nan
+            df[col] = valores
+    return df
+
+def carregar_csv(csv_path: str, colunas: list = None, delimiter: str = ";", encoding: str = "ISO-8859-1"):
+    """
+    Lê o CSV passando pelo cache Arrow. Retorna (DataFrame, versao), onde
+    versao é o sha1 do conteúdo do CSV ("vazio" se o arquivo não existe).
+
+    Se (mtime, tamanho) do CSV batem com os guardados no .arrow, lê só o
+    .arrow (memory-map). Se não batem, calcula o hash: conteúdo igual só
+    atualiza os metadados; conteúdo novo passa pelo read_csv e regrava o .arrow.
+    """
+    try:
+        st = os.stat(csv_path)
+    except OSError:
+        return pd.DataFrame(columns=colunas or []), "vazio"
+
+    if pa is None:
+        with open(csv_path, "rb") as f:
+            conteudo = f.read()
+        df = pd.read_csv(io.BytesIO(conteudo), delimiter=delimiter, encoding=encoding)
+        return df, hashlib.sha1(conteudo).hexdigest()
+
+    sidecar = caminho_sidecar(csv_path)
+    tabela, meta = _ler_sidecar(sidecar)
+    assinatura = {"mtime_ns": str(st.st_mtime_ns), "tamanho": str(st.st_size)}
+    if tabela is not None and all(meta.get(k) == v for k, v in assinatura.items()):
+        return _para_pandas(tabela), meta["sha1"]
+
+    with open(csv_path, "rb") as f:
+        conteudo = f.read()
+    sha1 = hashlib.sha1(conteudo).hexdigest()
+    novo_meta = dict(assinatura, sha1=sha1, formato=VERSAO_FORMATO)
+
+    if tabela is not None and meta.get("sha1") == sha1:
+        _gravar_sidecar(sidecar, tabela, novo_meta)
+        return _para_pandas(tabela), sha1
+
+    df = pd.read_csv(io.BytesIO(conteudo), delimiter=delimiter, encoding=encoding)
+    try:
+        tabela = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return df, sha1  # coluna com tipos misturados: segue sem cache
+    _gravar_sidecar(sidecar, tabela, novo_meta)
+    return df, sha1
@@ -0,0 +1,90 @@
+# kb_backend.py
+#
+# Ponto único de leitura/gravação do knowledge_base, usado pelo
+# knowledge_manager e pelo chat (chat/loaders.py).
+#
+#   KB_BACKEND=csv    (padrão) knowledge_base.csv + journal de edições
+#   KB_BACKEND=sqlite cópia local e indexada em SQLite, importada do CSV na
+#                     primeira vez e sempre que o CSV muda (mtime/tamanho);
+#                     cada edição é gravada no banco e exportada para o CSV,
+#                     que continua sendo a fonte compartilhada
+
+import os
+
+from filelock import FileLock
+
+from utils import kb_journal, kb_sqlite
+
+BACKEND = os.getenv("KB_BACKEND", "csv").lower()
+
+def usa_sqlite() -> bool:
+    return BACKEND == "sqlite"
+
+def _db(csv_path: str) -> str:
+    """Banco do CSV, (re)importado se o CSV é novo ou mudou desde a última importação."""
+    db_path = kb_sqlite.caminho_db(csv_path)
+    kb_sqlite.sincronizar(csv_path, db_path)
+    return db_path
+
+def carregar(csv_path: str, colunas: list = None):
+    """(DataFrame, versao) do knowledge_base no backend configurado."""
+    if usa_sqlite():
+        return kb_sqlite.carregar(_db(csv_path))
+    return kb_journal.carregar(csv_path, colunas)
+
+def registrar(csv_path: str, op: str, row_id: str, dados: dict = None):
+    """
+    insert/update/delete de uma linha (journal no CSV; no SQLite, transação
+    e exportação para o CSV, sob o mesmo lock do journal).
+    """
+    if usa_sqlite():
+        with FileLock(kb_journal.caminho_lock(csv_path), timeout=30):
+            db_path = _db(csv_path)
+            kb_sqlite.registrar(db_path, op, row_id, dados)
+            kb_sqlite.exportar_csv(csv_path, db_path)
+        return
+    return kb_journal.registrar(csv_path, op, row_id, dados)
+
+def _sem_caixa(serie):
+    return serie.astype(str).str.strip().str.lower()
+
+def buscar(csv_path: str, categoria: str, indicador: str, df=None):
+    """
+    Primeira linha (dict) com a categoria/indicador (sem caixa), ou None.
+    No SQLite usa o índice do banco; no CSV procura em 'df' (a base já
+    carregada) ou na base carregada agora.
+    """
+    if usa_sqlite():
+        return kb_sqlite.buscar(_db(csv_path), categoria, indicador)
+    if df is None:
+        df, _ = carregar(csv_path)
+    mascara = ((_sem_caixa(df["categoria"]) == str(categoria).strip().lower())
+               & (_sem_caixa(df["indicador"]) == str(indicador).strip().lower()))
+    encontradas = df[mascara.to_numpy()]
+    return encontradas.iloc[0].to_dict() if len(encontradas) else None
+
+def por_fonte(csv_path: str, fonte: str, df=None):
+    """
+    Linhas de uma fonte (sem caixa), com a posição na base como índice.
+    No SQLite usa o índice de fonte; no CSV filtra 'df' (ou a base carregada agora).
+    """
+    if usa_sqlite():
+        return kb_sqlite.por_fonte(_db(csv_path), fonte)
+    if df is None:
+        df, _ = carregar(csv_path)
+    df = df.reset_index(drop=True)
+    return df[_sem_caixa(df["fonte"]) == str(fonte).strip().lower()]
+
+def arquivos(csv_path: str) -> list:
+    """
+    Arquivos cujo stat indica mudança na base (para loaders e watcher).
+    No SQLite, sincroniza o banco com o CSV antes e inclui o CSV na lista:
+    uma regravação do CSV por fora também dispara a recarga.
+    """
+    if usa_sqlite():
+        db_path = _db(csv_path)
+        return [db_path, db_path + "-wal", csv_path]
+    return [csv_path, kb_journal.caminho_journal(csv_path)]
+
+id_linha = kb_journal.id_linha
+campos_alterados = kb_journal.campos_alterados
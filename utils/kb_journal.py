@@ -0,0 +1,310 @@
+# kb_journal.py
+#
+# Journal append-only das edições do knowledge_base.csv.
+#
+# Em vez de regravar o CSV inteiro a cada inclusão/edição/remoção, cada
+# operação vira uma linha JSON em "<csv>.journal". Quem lê a base aplica o
+# journal por cima do último CSV; de tempos em tempos (COMPACTAR_APOS
+# entradas) o journal é incorporado ao CSV e zerado. Todas as escritas
+# passam pelo mesmo filelock, então duas pessoas salvando juntas não
+# sobrescrevem uma à outra: cada uma só acrescenta a sua operação.
+
+import os
+import json
+import time
+import bisect
+import hashlib
+import unicodedata
+from collections import Counter
+
+import pandas as pd
+from filelock import FileLock
+
+from utils.csv_cache import carregar_csv
+from utils.state_files import gravar_csv, gravar_texto
+
+COMPACTAR_APOS = int(os.getenv("KB_JOURNAL_COMPACTAR_APOS", "200"))
+OPERACOES = ("insert", "update", "delete")
+
+def caminho_journal(csv_path: str) -> str:
+    return csv_path + ".journal"
+
+def caminho_lock(csv_path: str) -> str:
+    return csv_path + ".lock"
+
+def id_linha(categoria, indicador) -> str:
+    """Chave natural da linha: 'categoria|indicador' sem caixa e sem espaços nas pontas."""
+    return f"{str(categoria).strip().lower()}|{str(indicador).strip().lower()}"
+
+_hashes_base = {}
+
+def _sha1_arquivo(caminho: str) -> str:
+    """sha1 do CSV base, recalculado só quando (mtime, tamanho) mudam."""
+    try:
+        st = os.stat(caminho)
+    except OSError:
+        return "vazio"
+    assinatura = (st.st_mtime_ns, st.st_size)
+    memo = _hashes_base.get(caminho)
+    if memo is not None and memo[0] == assinatura:
+        return memo[1]
+    with open(caminho, "rb") as f:
+        sha1 = hashlib.sha1(f.read()).hexdigest()
+    _hashes_base[caminho] = (assinatura, sha1)
+    return sha1
+
+def valor_serializavel(valor):
+    """Valores vindos do Streamlit/pandas (date, numpy, NaN) em algo serializável."""
+    if valor is None or (isinstance(valor, float) and valor != valor):
+        return None
+    if hasattr(valor, "item"):  # numpy
+        return valor.item()
+    if hasattr(valor, "isoformat"):  # date/datetime
+        return valor.strftime("%d/%m/%Y")
+    return valor
+
+# O CSV é ISO-8859-1: o que não cabe nele é trocado antes de ir para o journal
+_TROCAS_LATIN1 = str.maketrans({
+    "\u2013": "-", "\u2014": "-", "\u2018": "'", "\u2019": "'",
+    "\u201c": '"', "\u201d": '"', "\u2026": "...", "\u2022": "-",
+})
+
+def para_latin1(valor):
+    """Texto representável em ISO-8859-1: aspas/travessões viram ASCII, acentos compostos são recompostos e o resto vira '?'."""
+    if not isinstance(valor, str):
+        return valor
+    try:
+        valor.encode("ISO-8859-1")
+        return valor
+    except UnicodeEncodeError:
+        pass
+    valor = unicodedata.normalize("NFC", valor.translate(_TROCAS_LATIN1))
+    return valor.encode("ISO-8859-1", errors="replace").decode("ISO-8859-1")
+
+def _normalizar_campo(valor):
+    valor = valor_serializavel(valor)
+    if valor is None:
+        return ""
+    if isinstance(valor, str):
+        valor = valor.strip()
+        try:
+            return float(valor) if valor else ""
+        except ValueError:
+            return valor
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return float(valor)
+    return valor
+
+def campos_alterados(iniciais: dict, novos: dict) -> dict:
+    """
+    Só os campos de 'novos' diferentes do valor inicial (o que o formulário
+    mostrou): 16 == 16.0 == "16", vazio == None == NaN e datas comparadas
+    como dd/mm/aaaa. O que não mudou não vai para o journal.
+    """
+    return {
+        campo: valor for campo, valor in novos.items()
+        if _normalizar_campo(iniciais.get(campo)) != _normalizar_campo(valor)
+    }
+
+ERRO_DUPLICADA = "Já existe uma entrada com esta categoria e indicador."
+
+def _ids_linhas(df: pd.DataFrame) -> list:
+    """Chave (id_linha) de cada linha do DataFrame, na ordem."""
+    if df.empty or "categoria" not in df.columns or "indicador" not in df.columns:
+        return []
+    return [id_linha(c, i) for c, i in zip(df["categoria"].tolist(), df["indicador"].tolist())]
+
+# csv_path -> chaves da base com o journal aplicado e nº de entradas, até
+# 'offset' bytes do journal (registrar só lê o que entrou desde a última vez)
+_estados = {}
+
+def _contar_chave(ids: Counter, entrada: dict):
+    """Atualiza a contagem de chaves como aplicar() faria com a entrada."""
+    row_id, op = entrada["id"], entrada["op"]
+    dados = entrada.get("dados") or {}
+    if op == "delete":
+        if ids[row_id] > 0:
+            ids[row_id] -= 1
+        return
+    if op == "update" and ids[row_id] > 0:
+        ids[row_id] -= 1
+        categoria, _, indicador = row_id.partition("|")
+        ids[id_linha(dados.get("categoria", categoria), dados.get("indicador", indicador))] += 1
+    else:
+        ids[id_linha(dados.get("categoria"), dados.get("indicador"))] += 1
+
+def _estado_journal(csv_path: str) -> dict:
+    """{'ids', 'entradas'} atualizados lendo só o final novo do journal (com o lock)."""
+    base = _sha1_arquivo(csv_path)
+    try:
+        tamanho = os.path.getsize(caminho_journal(csv_path))
+    except OSError:
+        tamanho = 0
+    estado = _estados.get(csv_path)
+    if estado is None or estado["base"] != base or tamanho < estado["offset"]:
+        estado = {"base": base, "offset": 0, "entradas": 0,
+                  "ids": Counter(_ids_linhas(carregar_csv(csv_path)[0]))}
+        _estados[csv_path] = estado
+    if tamanho > estado["offset"]:
+        with open(caminho_journal(csv_path), "rb") as f:
+            f.seek(estado["offset"])
+            bloco = f.read(tamanho - estado["offset"])
+        completo = bloco[:bloco.rfind(b"\n") + 1]
+        for linha in completo.decode("utf-8", errors="replace").splitlines():
+            try:
+                entrada = json.loads(linha)
+            except ValueError:
+                continue
+            estado["entradas"] += 1
+            if entrada.get("base") == base:
+                _contar_chave(estado["ids"], entrada)
+        estado["offset"] += len(completo)
+    return estado
+
+def registrar(csv_path: str, op: str, row_id: str, dados: dict = None):
+    """
+    Acrescenta uma operação ao journal (sob filelock) e compacta quando o
+    journal passa de COMPACTAR_APOS entradas. Um insert com
+    categoria/indicador já existentes é recusado (ValueError). A checagem e
+    a contagem leem só as entradas novas do journal, não a base inteira.
+    Textos fora do ISO-8859-1 são trocados (para_latin1).
+    """
+    if op not in OPERACOES:
+        raise ValueError(f"Operação inválida no journal: {op}")
+    with FileLock(caminho_lock(csv_path), timeout=30):
+        estado = _estado_journal(csv_path)
+        if op == "insert" and estado["ids"][row_id] > 0:
+            raise ValueError(ERRO_DUPLICADA)
+        entrada = {
+            "op": op,
+            "id": row_id,
+            "dados": {k: para_latin1(valor_serializavel(v)) for k, v in (dados or {}).items()},
+            "ts": time.time(),
+            "base": estado["base"],
+        }
+        with open(caminho_journal(csv_path), "a", encoding="utf-8") as f:
+            f.write(json.dumps(entrada, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        if _estado_journal(csv_path)["entradas"] >= COMPACTAR_APOS:
+            # A edição já está no journal: falha aqui não desfaz o salvamento
+            try:
+                _compactar_sem_lock(csv_path)
+            except (OSError, ValueError) as e:
+                print(f"[kb_journal] Não foi possível compactar {csv_path}: {e}")
+
+def ler_entradas(csv_path: str, base: str = None) -> list:
+    """
+    Entradas do journal em ordem. Com 'base', só as gravadas sobre essa
+    versão do CSV: se o CSV foi regerado por fora (macro do Excel), as
+    edições antigas não são reaplicadas sobre os dados novos.
+    """
+    entradas = []
+    try:
+        with open(caminho_journal(csv_path), "r", encoding="utf-8") as f:
+            for linha in f:
+                linha = linha.strip()
+                if not linha:
+                    continue
+                try:
+                    entrada = json.loads(linha)
+                except ValueError:
+                    continue  # linha truncada (queda no meio da escrita)
+                if base is None or entrada.get("base") == base:
+                    entradas.append(entrada)
+    except OSError:
+        pass
+    return entradas
+
+def texto_csv(valor) -> str:
+    """Valor do journal como texto do CSV: inteiro sem '.0', vazio para None/NaN."""
+    valor = valor_serializavel(valor)
+    if valor is None:
+        return ""
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+def aplicar(df: pd.DataFrame, entradas: list, converter=None) -> pd.DataFrame:
+    """
+    DataFrame com as operações do journal aplicadas em ordem sobre 'df'.
+
+    Linhas com a mesma chave são mantidas (update/delete atingem a primeira,
+    como as buscas do chat) e um insert com chave já existente entra como
+    linha nova, sem apagar a outra. 'converter' transforma os valores do
+    journal antes de aplicá-los (ex.: texto_csv na compactação).
+    """
+    if not entradas:
+        return df
+    linhas = df.to_dict("records")
+    # chave -> posições em 'linhas' (em ordem), None nas removidas
+    posicoes = {}
+    for pos, registro in enumerate(linhas):
+        posicoes.setdefault(id_linha(registro.get("categoria"), registro.get("indicador")), []).append(pos)
+
+    def mover(pos, de, para):
+        if de == para:
+            return
+        posicoes[de].remove(pos)
+        bisect.insort(posicoes.setdefault(para, []), pos)
+
+    for entrada in entradas:
+        row_id, op = entrada["id"], entrada["op"]
+        dados = entrada.get("dados") or {}
+        if converter is not None:
+            dados = {k: converter(v) for k, v in dados.items()}
+        existentes = posicoes.get(row_id)
+
+        if op == "delete":
+            if existentes:
+                linhas[existentes.pop(0)] = None
+            continue
+
+        if op == "update" and existentes:
+            pos = existentes[0]
+            linhas[pos] = dict(linhas[pos], **dados)
+        else:
+            # insert, ou update de uma linha que não existe mais
+            linhas.append(dict(dados))
+            pos = len(linhas) - 1
+            posicoes.setdefault(row_id, []).append(pos)
+        # A edição pode ter trocado categoria/indicador, e com eles a chave
+        mover(pos, row_id, id_linha(linhas[pos].get("categoria"), linhas[pos].get("indicador")))
+
+    resultado = pd.DataFrame([r for r in linhas if r is not None], columns=list(df.columns))
+    if converter is not None:
+        resultado = resultado.fillna("")
+    return resultado
+
+def carregar(csv_path: str, colunas: list = None):
+    """
+    (DataFrame, versao) do CSV com o journal aplicado. A versão combina o
+    hash do CSV com o do journal, então muda a cada edição registrada.
+    """
+    df, versao = carregar_csv(csv_path, colunas)
+    entradas = ler_entradas(csv_path, base=versao)
+    if not entradas:
+        return df, versao
+    digest = hashlib.sha1(json.dumps(entradas, sort_keys=True).encode("utf-8")).hexdigest()
+    return aplicar(df, entradas), f"{versao}+{digest[:12]}"
+
+def ler_texto_csv(csv_path: str) -> pd.DataFrame:
+    """CSV base com todas as colunas como texto, exatamente como estão no arquivo."""
+    if not os.path.exists(csv_path):
+        return pd.DataFrame()
+    return pd.read_csv(csv_path, sep=";", encoding="ISO-8859-1", dtype=str, keep_default_na=False)
+
+def _compactar_sem_lock(csv_path: str):
+    # Compacta sobre o texto do CSV (não sobre o DataFrame tipado): colunas
+    # inteiras com vazio não viram float ("16" -> "16.0") e o resto da linha
+    # é regravado exatamente como estava
+    entradas = ler_entradas(csv_path, base=_sha1_arquivo(csv_path))
+    if entradas:
+        df = aplicar(ler_texto_csv(csv_path), entradas, converter=lambda v: para_latin1(texto_csv(v)))
+        gravar_csv(csv_path, df, index=False, sep=";", encoding="ISO-8859-1")
+    gravar_texto(caminho_journal(csv_path), "")
+
+def compactar(csv_path: str):
+    """Incorpora o journal ao CSV e o zera (sob o mesmo lock das escritas)."""
+    with FileLock(caminho_lock(csv_path), timeout=60):
+        _compactar_sem_lock(csv_path)
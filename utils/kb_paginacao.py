@@ -0,0 +1,95 @@
+# kb_paginacao.py
+#
+# Paginação e ordenação no servidor para a página de Configurações: o
+# navegador recebe só a página atual, e os rótulos do seletor de edição
+# são montados só para as linhas dessa página.
+
+import math
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+TAMANHOS_PAGINA = [25, 50, 100, 250]
+
+_ORDENACOES = {}
+_ORDENACOES_MAX = 16
+_LOCK = threading.Lock()
+
+def ordem_linhas(data: pd.DataFrame, coluna: str = None, crescente: bool = True) -> np.ndarray:
+    """
+    Posições das linhas ordenadas por 'coluna' (texto sem caixa; vazios no
+    fim). Guardada por versão da base (data.attrs['versao']), então só
+    reordena quando a base ou a coluna escolhida mudam.
+    """
+    if not coluna or coluna not in data.columns:
+        return np.arange(len(data))
+
+    chave = (data.attrs.get("versao"), len(data), coluna, crescente)
+    with _LOCK:
+        ordem = _ORDENACOES.get(chave) if chave[0] is not None else None
+    if ordem is not None:
+        return ordem
+
+    valores = data[coluna]
+    if valores.dtype == object:
+        valores = valores.str.lower()
+    ordem = valores.reset_index(drop=True).sort_values(
+        ascending=crescente, kind="stable", na_position="last"
+    ).index.to_numpy()
+
+    if chave[0] is not None:
+        with _LOCK:
+            if len(_ORDENACOES) >= _ORDENACOES_MAX:
+                _ORDENACOES.pop(next(iter(_ORDENACOES)))
+            _ORDENACOES[chave] = ordem
+    return ordem
+
+def filtrar_ordem(ordem: np.ndarray, posicoes) -> np.ndarray:
+    """Mantém de 'ordem' só as posições filtradas (ex.: resultado da busca)."""
+    if posicoes is None:
+        return ordem
+    return ordem[np.isin(ordem, np.asarray(posicoes, dtype=ordem.dtype))]
+
+def total_paginas(total: int, tamanho: int) -> int:
+    return max(1, math.ceil(total / tamanho))
+
+def fatiar(posicoes, pagina: int, tamanho: int):
+    """Posições da página (1-based)."""
+    inicio = (pagina - 1) * tamanho
+    return posicoes[inicio:inicio + tamanho]
+
+def rotulos(data: pd.DataFrame, posicoes) -> dict:
+    """{posição: 'categoria - indicador'} só para as posições pedidas (vetorizado)."""
+    trecho = data.iloc[list(posicoes)]
+    textos = trecho["categoria"].astype(str) + " - " + trecho["indicador"].astype(str)
+    return dict(zip(posicoes, textos.tolist()))
+
+def tabela_paginada(data: pd.DataFrame, posicoes=None, chave: str = "kb") -> list:
+    """
+    Controles de ordenação/página + st.dataframe só da página atual.
+    'posicoes' (ex.: resultado da busca, já em ordem de relevância) limita
+    as linhas. Retorna as posições exibidas, para o seletor de edição.
+    """
+    col_ordem, col_sentido, col_tamanho, col_pagina = st.columns([3, 2, 2, 2])
+    opcoes = ["(ordem da base)"] + list(data.columns)
+    coluna = col_ordem.selectbox("Ordenar por", opcoes, key=f"{chave}_ordem")
+    crescente = col_sentido.radio("Sentido", ["Crescente", "Decrescente"], key=f"{chave}_sentido") == "Crescente"
+    tamanho = col_tamanho.selectbox("Linhas por página", TAMANHOS_PAGINA, key=f"{chave}_tamanho")
+
+    if coluna == opcoes[0]:
+        lista = np.asarray(posicoes if posicoes is not None else np.arange(len(data)), dtype=np.int64)
+        if not crescente:
+            lista = lista[::-1]
+    else:
+        lista = filtrar_ordem(ordem_linhas(data, coluna, crescente), posicoes)
+
+    paginas = total_paginas(len(lista), tamanho)
+    pagina = col_pagina.number_input("Página", min_value=1, max_value=paginas, value=1, step=1, key=f"{chave}_pagina")
+    pagina = min(int(pagina), paginas)
+    visiveis = [int(p) for p in fatiar(lista, pagina, tamanho)]
+
+    st.dataframe(data.iloc[visiveis])
+    st.caption(f"{len(lista)} linha(s) · página {pagina} de {paginas}")
+    return visiveis
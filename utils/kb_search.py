@@ -0,0 +1,107 @@
+# kb_search.py
+#
+# Índice de busca da página de Configurações: tokens sem acento e sem caixa
+# das colunas de texto do knowledge_base, montado uma vez por versão da base.
+# Cada termo da busca casa por prefixo ("fatu" acha "Faturamento"); uma
+# linha precisa casar todos os termos e o ranking soma o peso das colunas
+# onde eles aparecem (termo exato vale mais que prefixo).
+
+import re
+import bisect
+import threading
+import unicodedata
+
+import pandas as pd
+
+# Coluna -> peso no ranking
+CAMPOS_BUSCA = {
+    "indicador": 4,
+    "categoria": 3,
+    "subcategoria": 3,
+    "fonte": 2,
+    "melhores_vendedores": 1,
+    "piores_vendedores": 1,
+}
+BONUS_EXATO = 2
+
+def normalizar(texto) -> str:
+    """'Ivanhoé - R$ 1.195' -> 'ivanhoe r 1195'."""
+    if texto is None or (isinstance(texto, float) and texto != texto):
+        return ""
+    texto = unicodedata.normalize("NFKD", str(texto).lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r"(?<=\d)[.,](?=\d)", "", texto)  # 1.195.352 -> 1195352
+    return re.sub(r"[^a-z0-9]+", " ", texto).strip()
+
+def tokens(texto) -> list:
+    return normalizar(texto).split()
+
+class IndiceBusca:
+    """Índice invertido token -> {linha: peso}, com os tokens ordenados para busca por prefixo."""
+
+    def __init__(self, df: pd.DataFrame):
+        self.total = len(df)
+        postings = {}
+        for coluna, peso in CAMPOS_BUSCA.items():
+            if coluna not in df.columns:
+                continue
+            for pos, valor in enumerate(df[coluna].tolist()):
+                for token in set(tokens(valor)):
+                    linhas = postings.setdefault(token, {})
+                    linhas[pos] = linhas.get(pos, 0) + peso
+        self.postings = postings
+        self.vocabulario = sorted(postings)
+
+    def _por_prefixo(self, termo: str) -> dict:
+        """{linha: pontuação} das linhas com algum token começando por 'termo'."""
+        resultado = {}
+        inicio = bisect.bisect_left(self.vocabulario, termo)
+        for token in self.vocabulario[inicio:]:
+            if not token.startswith(termo):
+                break
+            bonus = BONUS_EXATO if token == termo else 1
+            for pos, peso in self.postings[token].items():
+                resultado[pos] = max(resultado.get(pos, 0), peso * bonus)
+        return resultado
+
+    def buscar(self, consulta: str, limite: int = None) -> list:
+        """
+        Posições das linhas que casam todos os termos, da mais relevante para
+        a menos (empate: ordem da base). Consulta vazia devolve todas.
+        """
+        termos = tokens(consulta)
+        if not termos:
+            return list(range(self.total))
+
+        pontos = None
+        for termo in termos:
+            encontrados = self._por_prefixo(termo)
+            if pontos is None:
+                pontos = encontrados
+            else:
+                pontos = {pos: pontos[pos] + p for pos, p in encontrados.items() if pos in pontos}
+            if not pontos:
+                return []
+
+        ordem = sorted(pontos, key=lambda pos: (-pontos[pos], pos))
+        return ordem[:limite] if limite else ordem
+
+_CACHE = {}
+_CACHE_MAX = 4
+_LOCK = threading.Lock()
+
+def get_indice_busca(df: pd.DataFrame) -> IndiceBusca:
+    """IndiceBusca da versão da base (df.attrs['versao'] ou hash do conteúdo)."""
+    chave = df.attrs.get("versao")
+    if chave is None:
+        colunas = [c for c in CAMPOS_BUSCA if c in df.columns]
+        chave = (len(df), int(pd.util.hash_pandas_object(df[colunas], index=False).sum()))
+    with _LOCK:
+        indice = _CACHE.get(chave)
+    if indice is None:
+        indice = IndiceBusca(df)
+        with _LOCK:
+            if len(_CACHE) >= _CACHE_MAX:
+                _CACHE.pop(next(iter(_CACHE)))
+            _CACHE[chave] = indice
+    return indice
@@ -0,0 +1,258 @@
+# kb_sqlite.py
+#
+# Backend opcional do knowledge_base em SQLite (KB_BACKEND=sqlite, ver
+# utils/kb_backend.py). Mesma interface do journal: carregar() devolve
+# (DataFrame, versao) e registrar() aplica insert/update/delete, aqui numa
+# transação. O banco é uma cópia local e indexada do CSV, que continua sendo
+# a fonte compartilhada: importar_csv lê o CSV como texto (linhas repetidas
+# inclusive) e exportar_csv o regrava depois de cada edição.
+#
+# A coluna 'ordem' é a posição da linha no CSV (0..n-1, sem buracos): as
+# posições devolvidas por por_fonte() valem direto no DataFrame de carregar().
+
+import os
+import sqlite3
+import hashlib
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.state_files import caminho_local, gravar_csv
+from utils.kb_journal import (
+    ERRO_DUPLICADA, ler_texto_csv, id_linha, para_latin1, texto_csv, valor_serializavel
+)
+
+COLUNAS = [
+    "categoria", "subcategoria", "indicador", "meta", "real", "percentual_atual",
+    "melhores_vendedores", "piores_vendedores", "dias_faltantes", "data_atualizacao", "fonte"
+]
+
+_conexoes = {}
+# Uma conexão por banco, compartilhada entre threads: todo uso passa por este lock
+_lock = threading.RLock()
+
+def caminho_db(csv_path: str) -> str:
+    """
+    Banco local da máquina para o CSV (ou KB_SQLITE_PATH): o WAL não é
+    confiável no compartilhamento SMB onde o CSV fica.
+    """
+    caminho = os.getenv("KB_SQLITE_PATH")
+    if caminho:
+        return caminho
+    origem = hashlib.sha1(os.path.abspath(csv_path).lower().encode("utf-8")).hexdigest()[:8]
+    nome = os.path.splitext(os.path.basename(csv_path))[0]
+    return caminho_local(f"{nome}_{origem}.sqlite3")
+
+def _criar_tabelas(conn):
+    colunas = [r[1] for r in conn.execute("PRAGMA table_info(knowledge_base)")]
+    if colunas and "id" not in colunas:
+        # Esquema antigo (row_id único, sem linhas repetidas): refeito e reimportado
+        conn.executescript("""
+            DROP TABLE knowledge_base;
+            DELETE FROM kb_meta WHERE chave IN ('csv_mtime_ns', 'csv_tamanho');
+        """)
+    conn.executescript(f"""
+        CREATE TABLE IF NOT EXISTS knowledge_base (
+            id INTEGER PRIMARY KEY,
+            row_id TEXT NOT NULL,
+            ordem INTEGER NOT NULL,
+            {", ".join(COLUNAS)}
+        );
+        CREATE INDEX IF NOT EXISTS idx_kb_row_id ON knowledge_base (row_id, ordem);
+        CREATE INDEX IF NOT EXISTS idx_kb_ordem ON knowledge_base (ordem);
+        CREATE INDEX IF NOT EXISTS idx_kb_fonte ON knowledge_base (fonte COLLATE NOCASE);
+        CREATE TABLE IF NOT EXISTS kb_meta (chave TEXT PRIMARY KEY, valor INTEGER NOT NULL);
+        INSERT OR IGNORE INTO kb_meta (chave, valor) VALUES ('versao', 0);
+    """)
+
+def conectar(db_path: str) -> sqlite3.Connection:
+    """Conexão compartilhada por caminho (WAL: leitores não bloqueiam a escrita)."""
+    with _lock:
+        conn = _conexoes.get(db_path)
+        if conn is None:
+            conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS kb_meta (chave TEXT PRIMARY KEY, valor INTEGER NOT NULL)")
+            _criar_tabelas(conn)
+            _conexoes[db_path] = conn
+        return conn
+
+class _Transacao:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK, incrementando a versão da base."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        _lock.acquire()
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, tipo, valor, tb):
+        try:
+            if tipo is None:
+                self.conn.execute("UPDATE kb_meta SET valor = valor + 1 WHERE chave = 'versao'")
+                self.conn.execute("COMMIT")
+            else:
+                self.conn.execute("ROLLBACK")
+        finally:
+            _lock.release()
+        return False
+
+def versao(db_path: str) -> int:
+    conn = conectar(db_path)
+    with _lock:
+        return conn.execute("SELECT valor FROM kb_meta WHERE chave = 'versao'").fetchone()[0]
+
+def _valor(valor):
+    """Texto como vai para o CSV (ISO-8859-1, inteiros sem '.0'); None fica NULL."""
+    valor = valor_serializavel(valor)
+    return None if valor is None else para_latin1(texto_csv(valor))
+
+def _inserir(conn, registros: list, ordem_inicial: int):
+    placeholders = ", ".join("?" for _ in COLUNAS)
+    conn.executemany(
+        f"INSERT INTO knowledge_base (row_id, ordem, {', '.join(COLUNAS)}) VALUES (?, ?, {placeholders})",
+        [
+            (id_linha(r.get("categoria"), r.get("indicador")), ordem_inicial + i,
+             *[_valor(r.get(c)) for c in COLUNAS])
+            for i, r in enumerate(registros)
+        ]
+    )
+
+def assinatura_csv(csv_path: str):
+    """(mtime, tamanho) do CSV, ou None se ele não existe."""
+    try:
+        st = os.stat(csv_path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def _gravar_assinatura(conn, assinatura):
+    conn.executemany(
+        "INSERT OR REPLACE INTO kb_meta (chave, valor) VALUES (?, ?)",
+        [("csv_mtime_ns", assinatura[0]), ("csv_tamanho", assinatura[1])]
+    )
+
+def assinatura_importada(db_path: str):
+    """(mtime, tamanho) do CSV na última importação/exportação, ou None."""
+    conn = conectar(db_path)
+    with _lock:
+        valores = dict(conn.execute(
+            "SELECT chave, valor FROM kb_meta WHERE chave IN ('csv_mtime_ns', 'csv_tamanho')"
+        ).fetchall())
+    if len(valores) < 2:
+        return None
+    return (valores["csv_mtime_ns"], valores["csv_tamanho"])
+
+def sincronizar(csv_path: str, db_path: str = None) -> bool:
+    """
+    Reimporta o CSV quando ele mudou desde a última importação/exportação
+    (ex.: a macro AtualizarKnowledgeBase regerou o arquivo, ou outra máquina
+    salvou uma edição). Devolve True se reimportou. As edições deste banco
+    já estão no CSV (exportar_csv), então a reimportação não as perde.
+    """
+    db_path = db_path or caminho_db(csv_path)
+    assinatura = assinatura_csv(csv_path)
+    if assinatura is None or assinatura == assinatura_importada(db_path):
+        return False
+    importar_csv(csv_path, db_path)
+    return True
+
+def importar_csv(csv_path: str, db_path: str = None):
+    """Substitui o conteúdo do banco pelo CSV, linha a linha e como texto (numa transação)."""
+    db_path = db_path or caminho_db(csv_path)
+    assinatura = assinatura_csv(csv_path)
+    df = ler_texto_csv(csv_path).reindex(columns=COLUNAS)
+    registros = df.where(df.notna(), None).to_dict("records")
+    conn = conectar(db_path)
+    with _Transacao(conn):
+        if assinatura is not None:
+            _gravar_assinatura(conn, assinatura)
+        conn.execute("DELETE FROM knowledge_base")
+        _inserir(conn, registros, 0)
+
+def exportar_csv(csv_path: str, db_path: str = None):
+    """
+    Grava o conteúdo do banco no formato do knowledge_base.csv. Quem chama
+    segura o lock do CSV (ver kb_backend.registrar).
+    """
+    db_path = db_path or caminho_db(csv_path)
+    gravar_csv(csv_path, _ler_texto(db_path).fillna(""), index=False, sep=";", encoding="ISO-8859-1")
+    # O CSV agora é cópia do banco: não reimportar por causa desta gravação
+    conn = conectar(db_path)
+    with _lock:
+        _gravar_assinatura(conn, assinatura_csv(csv_path))
+
+def _ler_texto(db_path: str) -> pd.DataFrame:
+    """Conteúdo do banco como está gravado (texto do CSV), na ordem do CSV."""
+    conn = conectar(db_path)
+    with _lock:
+        return pd.read_sql_query(f"SELECT {', '.join(COLUNAS)} FROM knowledge_base ORDER BY ordem", conn)
+
+def _tipar(df: pd.DataFrame) -> pd.DataFrame:
+    """Mesmos tipos do read_csv do backend CSV: vazio vira NaN e colunas só de números viram numéricas."""
+    df = df.replace("", None).fillna(np.nan)
+    for coluna in df.columns:
+        try:
+            df[coluna] = pd.to_numeric(df[coluna])
+        except (ValueError, TypeError):
+            pass
+    return df
+
+def carregar(db_path: str):
+    """(DataFrame na ordem do CSV, versao) do banco."""
+    with _lock:
+        return _tipar(_ler_texto(db_path)), f"sqlite:{versao(db_path)}"
+
+def registrar(db_path: str, op: str, row_id: str, dados: dict = None):
+    """
+    insert/update/delete de uma linha, numa transação. Como no journal,
+    update/delete atingem a primeira linha com a chave e um insert com
+    chave já existente é recusado (ValueError).
+    """
+    if op not in ("insert", "update", "delete"):
+        raise ValueError(f"Operação inválida: {op}")
+    dados = {k: v for k, v in (dados or {}).items() if k in COLUNAS}
+    conn = conectar(db_path)
+    with _Transacao(conn):
+        atual = conn.execute(
+            f"SELECT id, ordem, {', '.join(COLUNAS)} FROM knowledge_base WHERE row_id = ? ORDER BY ordem LIMIT 1",
+            (row_id,)
+        ).fetchone()
+        if op == "delete":
+            if atual is not None:
+                conn.execute("DELETE FROM knowledge_base WHERE id = ?", (atual[0],))
+                conn.execute("UPDATE knowledge_base SET ordem = ordem - 1 WHERE ordem > ?", (atual[1],))
+            return
+        if op == "insert" and atual is not None:
+            raise ValueError(ERRO_DUPLICADA)
+        if atual is not None:
+            registro = dict(zip(COLUNAS, atual[2:]), **dados)
+            ordem = atual[1]
+            conn.execute("DELETE FROM knowledge_base WHERE id = ?", (atual[0],))
+        else:
+            # insert, ou update de uma linha que não existe mais
+            registro = dados
+            ordem = conn.execute("SELECT COALESCE(MAX(ordem), -1) + 1 FROM knowledge_base").fetchone()[0]
+        _inserir(conn, [registro], ordem)
+
+def buscar(db_path: str, categoria: str, indicador: str):
+    """Primeira linha (dict) por categoria/indicador sem caixa (índice de row_id); None se não existe."""
+    conn = conectar(db_path)
+    with _lock:
+        row = conn.execute(
+            f"SELECT {', '.join(COLUNAS)} FROM knowledge_base WHERE row_id = ? ORDER BY ordem LIMIT 1",
+            (id_linha(categoria, indicador),)
+        ).fetchone()
+    return dict(zip(COLUNAS, row)) if row else None
+
+def por_fonte(db_path: str, fonte: str) -> pd.DataFrame:
+    """Linhas de uma fonte (ex.: 'Promax'), pelo índice de fonte; o índice do DataFrame é a posição na base."""
+    conn = conectar(db_path)
+    with _lock:
+        return pd.read_sql_query(
+            f"SELECT ordem, {', '.join(COLUNAS)} FROM knowledge_base WHERE fonte = ? COLLATE NOCASE ORDER BY ordem",
+            conn, params=(str(fonte).strip(),), index_col="ordem"
+        ).rename_axis(None)
@@ -1,28 +1,28 @@
 import streamlit as st
 import pandas as pd
-import os
 
 from utils.credits import show_credits
+from utils import kb_backend
+from utils.kb_search import get_indice_busca
+from utils.kb_paginacao import tabela_paginada, rotulos
 
 # Caminho para o arquivo CSV
 CSV_PATH = "knowledge_base.csv"
 
 # Função para carregar o CSV
 def load_csv():
-    if os.path.exists(CSV_PATH):
-        # Lê o CSV com as colunas já definidas na nova estrutura
-        df = pd.read_csv(CSV_PATH, delimiter=";", encoding="ISO-8859-1")
-        return df
-    else:
-        return pd.DataFrame(columns=[
-            "categoria", "subcategoria", "indicador", "meta", "real", 
-            "percentual_atual", "melhores_vendedores", "piores_vendedores", 
-            "dias_faltantes", "data_atualizacao", "fonte"
-        ])
-
-# Função para salvar o CSV com a nova estrutura
-def save_csv(data):
-    data.to_csv(CSV_PATH, index=False, sep=";", encoding="ISO-8859-1")
+    # CSV + journal de edições, ou SQLite com KB_BACKEND=sqlite (ver utils/kb_backend.py)
+    data, versao = kb_backend.carregar(CSV_PATH, colunas=[
+        "categoria", "subcategoria", "indicador", "meta", "real", 
+        "percentual_atual", "melhores_vendedores", "piores_vendedores", 
+        "dias_faltantes", "data_atualizacao", "fonte"
+    ])
+    data.attrs["versao"] = versao  # chave do índice de busca
+    return data
+
+# Função para registrar inclusão/edição/remoção no journal (sem regravar o CSV)
+def registrar_edicao(op, categoria, indicador, dados=None):
+    kb_backend.registrar(CSV_PATH, op, kb_backend.id_linha(categoria, indicador), dados)
 
 # Função para exportar os dados
 def export_data(data, format):
@@ -42,22 +42,19 @@ def main():
     # Campo de busca
     st.subheader("Buscar na Base de Conhecimento")
     search_query = st.text_input("Digite sua busca")
-    if search_query:
-        # Garantir que as colunas sejam do tipo string
-        for col in ["categoria", "subcategoria", "indicador", "fonte"]:
-            if col in data.columns:
-                data[col] = data[col].astype(str)
-
-        # Aplicar a busca
-        filtered_data = data[
-            data["categoria"].str.contains(search_query, case=False, na=False) |
-            data["subcategoria"].str.contains(search_query, case=False, na=False) |
-            data["indicador"].str.contains(search_query, case=False, na=False) |
-            data["fonte"].str.contains(search_query, case=False, na=False)
-        ]
-        st.dataframe(filtered_data)
-    else:
-        st.dataframe(data)
+    # Busca no índice da versão atual da base (sem acento, por prefixo, com ranking)
+    posicoes = get_indice_busca(data).buscar(search_query) if search_query else None
+    # Filtro por fonte (no SQLite, pelo índice de fonte do banco)
+    fontes = sorted({str(f).strip() for f in data["fonte"].dropna() if str(f).strip()})
+    fonte = st.selectbox("Fonte", ["Todas"] + fontes)
+    if fonte != "Todas":
+        da_fonte = [p for p in kb_backend.por_fonte(CSV_PATH, fonte, data).index if p < len(data)]
+        if posicoes is not None:
+            na_fonte = set(da_fonte)
+            da_fonte = [p for p in posicoes if p in na_fonte]
+        posicoes = da_fonte
+    # Tabela paginada: só a página atual vai para o navegador
+    visiveis = tabela_paginada(data, posicoes)
 
     # Formulário para adicionar uma nova entrada
     st.subheader("\u2795 Adicionar Nova Informação")
@@ -75,7 +72,7 @@ def main():
         new_source = st.text_input("Fonte")
         submitted = st.form_submit_button("Adicionar")
         if submitted:
-            if all([new_category, new_subcategory, new_indicator, new_source]):
+            if all(campo.strip() for campo in [new_category, new_subcategory, new_indicator, new_source]):
                 new_entry = pd.DataFrame({
                     "categoria": [new_category],
                     "subcategoria": [new_subcategory],
@@ -89,9 +86,11 @@ def main():
                     "data_atualizacao": [new_update_date],
                     "fonte": [new_source]
                 })
-                data = pd.concat([data, new_entry], ignore_index=True)
-                save_csv(data)
-                st.success("Nova entrada adicionada com sucesso!")
+                try:
+                    registrar_edicao("insert", new_category, new_indicator, new_entry.iloc[0].to_dict())
+                    st.success("Nova entrada adicionada com sucesso!")
+                except ValueError as e:
+                    st.error(str(e))
             else:
                 st.error("Por favor, preencha todos os campos obrigatórios!")
 
@@ -99,13 +98,17 @@ def main():
     st.subheader("\u270F\ufe0f Editar ou Remover Informações")
     if not data.empty:
         if 'indicador' in data.columns:
+            # Opções e rótulos só das linhas da página atual
+            nomes = rotulos(data, visiveis)
             selected_index = st.selectbox(
                 "Selecione a entrada para editar ou remover", 
-                data.index,
-                format_func=lambda x: f"{data.iloc[x]['categoria']} - {data.iloc[x]['indicador']}"
+                visiveis,
+                format_func=nomes.get
             )
 
             if selected_index is not None:
+                linha = data.iloc[selected_index]
+                data_inicial = pd.to_datetime(linha["data_atualizacao"])
                 category_to_edit = st.text_input("Categoria", data.iloc[selected_index]["categoria"])
                 subcategory_to_edit = st.text_input("Subcategoria", data.iloc[selected_index]["subcategoria"])
                 indicator_to_edit = st.text_area("Indicador", data.iloc[selected_index]["indicador"])
@@ -115,28 +118,33 @@ def main():
                 best_sellers_to_edit = st.text_area("Melhores Vendedores", data.iloc[selected_index]["melhores_vendedores"])
                 worst_sellers_to_edit = st.text_area("Piores Vendedores", data.iloc[selected_index]["piores_vendedores"])
                 days_left_to_edit = st.number_input("Dias Restantes", value=data.iloc[selected_index]["dias_faltantes"], min_value=0, step=1)
-                update_date_to_edit = st.date_input("Data de Atualização", value=pd.to_datetime(data.iloc[selected_index]["data_atualizacao"]))
+                update_date_to_edit = st.date_input("Data de Atualização", value=data_inicial)
                 source_to_edit = st.text_input("Fonte", data.iloc[selected_index]["fonte"])
 
                 # Botões para salvar ou excluir
                 if st.button("Salvar Alterações"):
-                    data.at[selected_index, "categoria"] = category_to_edit
-                    data.at[selected_index, "subcategoria"] = subcategory_to_edit
-                    data.at[selected_index, "indicador"] = indicator_to_edit
-                    data.at[selected_index, "meta"] = meta_to_edit
-                    data.at[selected_index, "real"] = real_to_edit
-                    data.at[selected_index, "percentual_atual"] = percentual_to_edit
-                    data.at[selected_index, "melhores_vendedores"] = best_sellers_to_edit
-                    data.at[selected_index, "piores_vendedores"] = worst_sellers_to_edit
-                    data.at[selected_index, "dias_faltantes"] = days_left_to_edit
-                    data.at[selected_index, "data_atualizacao"] = update_date_to_edit
-                    data.at[selected_index, "fonte"] = source_to_edit
-                    save_csv(data)
-                    st.success("Alterações salvas com sucesso!")
+                    # Só os campos que mudaram em relação ao que o formulário mostrou vão para o journal
+                    alterados = kb_backend.campos_alterados(dict(linha.to_dict(), data_atualizacao=data_inicial), {
+                        "categoria": category_to_edit,
+                        "subcategoria": subcategory_to_edit,
+                        "indicador": indicator_to_edit,
+                        "meta": meta_to_edit,
+                        "real": real_to_edit,
+                        "percentual_atual": percentual_to_edit,
+                        "melhores_vendedores": best_sellers_to_edit,
+                        "piores_vendedores": worst_sellers_to_edit,
+                        "dias_faltantes": days_left_to_edit,
+                        "data_atualizacao": update_date_to_edit,
+                        "fonte": source_to_edit,
+                    })
+                    if alterados:
+                        registrar_edicao("update", linha["categoria"], linha["indicador"], alterados)
+                        st.success("Alterações salvas com sucesso!")
+                    else:
+                        st.info("Nenhuma alteração para salvar.")
 
                 if st.button("Remover Entrada"):
-                    data = data.drop(index=selected_index).reset_index(drop=True)
-                    save_csv(data)
+                    registrar_edicao("delete", data.iloc[selected_index]["categoria"], data.iloc[selected_index]["indicador"])
                     st.success("Entrada removida com sucesso!")
     else:
         st.info("A base de dados está vazia.")
@@ -0,0 +1,136 @@
+# output_pump.py
+#
+# Leitura da saída dos scripts agendados sem polling: uma thread lê o stdout
+# do processo em blocos assim que os dados chegam (read1 devolve o que já
+# está no pipe) e entrega as linhas completas a um LogBufferizado, que mantém
+# o arquivo de log aberto e grava em lote, com flush por tempo/quantidade.
+
+import os
+import sys
+import time
+import codecs
+import threading
+from datetime import datetime
+
+TAMANHO_BLOCO = 64 * 1024
+
+class LogBufferizado:
+    """
+    Log de uma execução: mesmo formato do registrar_log ("[data] mensagem"),
+    mas com o arquivo aberto durante toda a execução e flush a cada
+    'flush_intervalo' segundos ou 'flush_linhas' linhas (e sempre no fechar).
+    Uma thread grava o pendente a cada 'flush_intervalo' mesmo sem linhas
+    novas, então um script quieto não segura a última saída no buffer.
+    """
+
+    def __init__(self, caminho: str, flush_intervalo: float = 1.0, flush_linhas: int = 1000, eco: bool = True):
+        self.caminho = caminho
+        self.flush_intervalo = flush_intervalo
+        self.flush_linhas = flush_linhas
+        self.eco = eco
+        self._arquivo = open(caminho, "a", encoding="utf-8")
+        self._pendentes = []
+        self._ultimo_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._fechado = threading.Event()
+        self._temporizador = None
+        if flush_intervalo and flush_intervalo > 0:
+            self._temporizador = threading.Thread(target=self._flush_periodico, daemon=True)
+            self._temporizador.start()
+
+    def _flush_periodico(self):
+        while not self._fechado.wait(self.flush_intervalo):
+            with self._lock:
+                if not self._fechado.is_set():
+                    self._flush_sem_lock()
+
+    def escrever(self, linhas):
+        """Acrescenta linhas (sem '\\n'); grava se passou o tempo ou a quantidade."""
+        if isinstance(linhas, str):
+            linhas = [linhas]
+        data_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            self._pendentes.extend(f"[{data_str}] {linha}\n" for linha in linhas)
+            if (len(self._pendentes) >= self.flush_linhas
+                    or time.monotonic() - self._ultimo_flush >= self.flush_intervalo):
+                self._flush_sem_lock()
+
+    def _flush_sem_lock(self):
+        if self._pendentes:
+            texto = "".join(self._pendentes)
+            self._pendentes.clear()
+            self._arquivo.write(texto)
+            self._arquivo.flush()
+            if self.eco:
+                sys.stdout.write(texto)
+                sys.stdout.flush()
+        self._ultimo_flush = time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            self._flush_sem_lock()
+
+    def fechar(self):
+        with self._lock:
+            if self._fechado.is_set():
+                return
+            self._fechado.set()
+            self._flush_sem_lock()
+            self._arquivo.close()
+        if self._temporizador is not None:
+            self._temporizador.join(timeout=1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+        return False
+
+class BombaSaida(threading.Thread):
+    """
+    Thread que esvazia um pipe binário (proc.stdout) em blocos, decodifica
+    incrementalmente e entrega as linhas completas a 'destino(linhas)'.
+    Termina sozinha no EOF (processo encerrado); 'bytes_lidos' fica com o
+    total de saída.
+    """
+
+    def __init__(self, fluxo, destino, encoding: str = "utf-8", tamanho_bloco: int = TAMANHO_BLOCO):
+        super().__init__(daemon=True)
+        self.fluxo = fluxo
+        self.destino = destino
+        self.decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self.tamanho_bloco = tamanho_bloco
+        self.bytes_lidos = 0
+        self.erro = None
+
+    def _ler(self) -> bytes:
+        ler_disponivel = getattr(self.fluxo, "read1", None)
+        if ler_disponivel is not None:
+            return ler_disponivel(self.tamanho_bloco)
+        return os.read(self.fluxo.fileno(), self.tamanho_bloco)
+
+    def run(self):
+        resto = ""
+        try:
+            while True:
+                bloco = self._ler()
+                if not bloco:
+                    break
+                self.bytes_lidos += len(bloco)
+                texto = resto + self.decoder.decode(bloco)
+                linhas = texto.split("\n")
+                resto = linhas.pop()
+                if linhas:
+                    self.destino([linha.rstrip("\r") for linha in linhas])
+            resto += self.decoder.decode(b"", final=True)
+            if resto:
+                self.destino([resto.rstrip("\r")])
+        except Exception as e:  # não derruba o scheduler por causa do log
+            self.erro = e
+
+def bombear_saida(proc, log: LogBufferizado, encoding: str = "utf-8") -> BombaSaida:
+    """Inicia a BombaSaida do stdout de 'proc' (Popen binário) gravando em 'log'."""
+    bomba = BombaSaida(proc.stdout, log.escrever, encoding=encoding)
+    bomba.start()
+    return bomba
@@ -0,0 +1,152 @@
+# rotinas_config.py
+#
+# Config de rotinas isolada por execução. Em vez de sobrescrever o
+# rotinas_config.json compartilhado e restaurá-lo depois (o que impedia duas
+# tarefas de rodarem juntas e deixava o override para trás se algo caísse no
+# meio), cada execução grava a sua cópia num arquivo temporário e passa o
+# caminho ao script filho pela variável de ambiente ROTINAS_CONFIG_PATH.
+#
+# O script filho (ex.: main.py do Promax) deve ler a config com
+# carregar_config_rotinas() ou, sem importar este módulo:
+#   caminho = os.environ.get("ROTINAS_CONFIG_PATH", "rotinas_config.json")
+#
+# Compatibilidade: enquanto o main.py ainda lê só o rotinas_config.json,
+# ROTINAS_CONFIG_COMPAT=1 (padrão) também aplica o override no arquivo
+# compartilhado e o restaura no fim, como antes. Só as execuções com
+# override ficam em série (lock entre threads e processos enquanto o override
+# está no arquivo); as sem override não seguram o lock, só esperam um
+# override em andamento terminar antes de começar, e as tarefas que não leem
+# o rotinas_config.json (ex.: plan_gc, plan_faturamento) nem passam por aqui.
+# A cópia original fica em rotinas_config.json.original até a restauração, e
+# é recuperada na próxima execução se o processo cair no meio. Com o main.py
+# atualizado, usar ROTINAS_CONFIG_COMPAT=0 para não haver lock nenhum.
+
+import os
+import tempfile
+import threading
+from contextlib import ExitStack, contextmanager, nullcontext
+
+from utils.state_files import bloqueio, gravar_json, ler_json
+
+ENV_CONFIG = "ROTINAS_CONFIG_PATH"
+ENV_COMPAT = "ROTINAS_CONFIG_COMPAT"
+
+_execucao_lock = threading.Lock()
+
+class ConfigEmUso(TimeoutError):
+    """O rotinas_config.json está com o override de outra execução (modo compat)."""
+
+def modo_compat() -> bool:
+    """Se o override também deve ir para o rotinas_config.json compartilhado."""
+    return os.getenv(ENV_COMPAT, "1").strip().lower() not in ("0", "false", "nao", "não", "")
+
+def montar_config(base: dict, override: dict = None) -> dict:
+    """
+    Config resultante de 'override' sobre 'base' (nenhum dos dois é
+    alterado). '__all__' liga/desliga todas as rotinas antes das demais chaves.
+    """
+    config = dict(base)
+    if override:
+        if "__all__" in override:
+            for k in config.keys():
+                config[k] = bool(override["__all__"])
+        for k, v in override.items():
+            if k != "__all__":
+                config[k] = v
+    return config
+
+def criar_snapshot(config_path: str, override: dict = None) -> str:
+    """Grava a config desta execução num temporário e devolve o caminho."""
+    base = ler_json(config_path) if os.path.exists(config_path) else {}
+    fd, caminho = tempfile.mkstemp(prefix="rotinas_config_", suffix=".json")
+    os.close(fd)
+    gravar_json(caminho, montar_config(base, override))
+    return caminho
+
+def remover_snapshot(caminho: str):
+    """Apaga o temporário da execução (ignora se já não existe)."""
+    if not caminho:
+        return
+    try:
+        os.remove(caminho)
+    except OSError:
+        pass
+
+def _recuperar_original(config_path: str, original_path: str):
+    """Restaura o config deixado com override por uma execução que caiu."""
+    if os.path.exists(original_path):
+        gravar_json(config_path, ler_json(original_path), bloquear=True)
+        remover_snapshot(original_path)
+
+@contextmanager
+def _lock_execucao(config_path: str, timeout: float = -1):
+    """Lock das execuções com override (threads e processos); timeout < 0 espera sem limite."""
+    with ExitStack() as pilha:
+        if not _execucao_lock.acquire(timeout=timeout):
+            raise ConfigEmUso(f"{config_path} em uso por outra execução.")
+        pilha.callback(_execucao_lock.release)
+        try:
+            pilha.enter_context(bloqueio(config_path + ".execucao", timeout=timeout))
+        except TimeoutError:  # filelock.Timeout
+            raise ConfigEmUso(f"{config_path} em uso por outra execução.") from None
+        yield
+
+@contextmanager
+def _override_compartilhado(config_path: str, override: dict = None, timeout: float = -1):
+    """
+    Modo compat: grava o override no config compartilhado e restaura o
+    original ao sair, segurando o lock de execução só nesse caso. Sem
+    override, espera um override em andamento terminar e solta o lock antes
+    de rodar.
+    """
+    original_path = config_path + ".original"
+    if not override or not os.path.exists(config_path):
+        with _lock_execucao(config_path, timeout):
+            _recuperar_original(config_path, original_path)
+        yield
+        return
+    with _lock_execucao(config_path, timeout):
+        _recuperar_original(config_path, original_path)
+        base = ler_json(config_path)
+        aplicado = montar_config(base, override)
+        gravar_json(original_path, base)
+        gravar_json(config_path, aplicado, bloquear=True)
+        try:
+            yield
+        finally:
+            # Se o config foi salvo pela tela durante a execução, fica o novo
+            if ler_json(config_path) == aplicado:
+                gravar_json(config_path, base, bloquear=True)
+            remover_snapshot(original_path)
+
+@contextmanager
+def config_isolada(config_path: str, override: dict = None, env: dict = None,
+                   compat: bool = None, timeout: float = -1):
+    """
+    with config_isolada(CONFIG_FILE, {"__all__": False, "030111": True}) as env:
+        subprocess.Popen([...], env=env)
+
+    'env' (padrão: os.environ) ganha ROTINAS_CONFIG_PATH apontando para a
+    cópia; o temporário é apagado ao sair, mesmo com erro. Em modo compat
+    (padrão: ROTINAS_CONFIG_COMPAT) o override também vale no arquivo
+    compartilhado enquanto o bloco roda. Usar só para scripts que leem o
+    rotinas_config.json.
+
+    'timeout' (segundos; < 0 espera sem limite) vale para a espera pelo
+    override de outra execução: esgotado, levanta ConfigEmUso. Na tela do
+    Streamlit, passar um limite, para não travar a página.
+    """
+    compat = modo_compat() if compat is None else compat
+    caminho = None
+    try:
+        with (_override_compartilhado(config_path, override, timeout) if compat else nullcontext()):
+            caminho = criar_snapshot(config_path, override)
+            ambiente = dict(os.environ if env is None else env)
+            ambiente[ENV_CONFIG] = caminho
+            yield ambiente
+    finally:
+        remover_snapshot(caminho)
+
+def carregar_config_rotinas(padrao: str = "rotinas_config.json") -> dict:
+    """Lado do script filho: a config da execução, ou a compartilhada se rodar avulso."""
+    return ler_json(os.environ.get(ENV_CONFIG) or padrao)
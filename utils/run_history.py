@@ -0,0 +1,247 @@
+# run_history.py
+#
+# Histórico estruturado das execuções (agendadas e manuais) num SQLite
+# local (fora do compartilhamento SMB do projeto, onde o WAL não é
+# confiável; RUN_HISTORY_PATH escolhe outro arquivo): tarefa, gatilho, início/fim, duração, código de saída, bytes de
+# saída e pico de memória (RSS do processo e filhos, via psutil). A linha é
+# criada no início (fim/returncode vazios = em andamento) e completada no
+# fim, então uma execução que derrubou o processo aparece sem fim.
+#
+#   with registrar_execucao("principal", "agendado") as execucao:
+#       proc = subprocess.Popen(...)
+#       execucao.acompanhar(proc)
+#       ...
+#       execucao.finalizar(proc.returncode, bytes_saida)
+
+import os
+import time
+import sqlite3
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+
+import pandas as pd
+
+from utils.state_files import caminho_local
+
+try:
+    import psutil
+except ImportError:  # sem psutil, o pico de memória fica vazio
+    psutil = None
+
+GATILHOS = ("agendado", "manual")
+INTERVALO_RSS = 0.5
+
+def caminho_db() -> str:
+    """RUN_HISTORY_PATH, ou run_history.sqlite3 em %LOCALAPPDATA% (ou no temp) da máquina."""
+    return caminho_local("run_history.sqlite3", "RUN_HISTORY_PATH")
+
+_criados = set()
+_lock = threading.Lock()
+
+def conectar(db_path: str = None) -> sqlite3.Connection:
+    """
+    Conexão nova por operação (scheduler e app são processos diferentes e o
+    executor grava de várias threads); WAL para ler enquanto outro grava.
+    """
+    db_path = db_path or caminho_db()
+    conn = sqlite3.connect(db_path, timeout=30)
+    with _lock:
+        if db_path not in _criados:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS execucoes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    tarefa TEXT NOT NULL,
+                    gatilho TEXT NOT NULL,
+                    inicio REAL NOT NULL,
+                    fim REAL,
+                    duracao REAL,
+                    returncode INTEGER,
+                    bytes_saida INTEGER,
+                    pico_rss INTEGER,
+                    erro TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_execucoes_tarefa_inicio ON execucoes (tarefa, inicio);
+                CREATE INDEX IF NOT EXISTS idx_execucoes_inicio ON execucoes (inicio);
+            """)
+            _criados.add(db_path)
+    return conn
+
+class MonitorRSS(threading.Thread):
+    """Amostra o RSS do processo (somando os filhos) até parar(); guarda o pico."""
+
+    def __init__(self, pid: int, intervalo: float = INTERVALO_RSS):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.intervalo = intervalo
+        self.pico = None
+        self._parar = threading.Event()
+
+    def _amostrar(self, processo) -> int:
+        rss = processo.memory_info().rss
+        for filho in processo.children(recursive=True):
+            try:
+                rss += filho.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+        return rss
+
+    def run(self):
+        try:
+            processo = psutil.Process(self.pid)
+            while True:
+                rss = self._amostrar(processo)
+                self.pico = rss if self.pico is None else max(self.pico, rss)
+                if self._parar.wait(self.intervalo):
+                    break
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass  # processo terminou (ou não pode ser lido): fica o último pico
+
+    def parar(self) -> int:
+        self._parar.set()
+        self.join(timeout=5)
+        return self.pico
+
+class Execucao:
+    """Uma execução em andamento; finalizar() completa a linha no banco."""
+
+    def __init__(self, tarefa: str, gatilho: str, db_path: str = None):
+        if gatilho not in GATILHOS:
+            raise ValueError(f"Gatilho inválido: {gatilho}")
+        self.tarefa = tarefa
+        self.gatilho = gatilho
+        self.db_path = db_path or caminho_db()
+        self.inicio = time.time()
+        self._t0 = time.perf_counter()
+        self._monitor = None
+        self.finalizada = False
+        # Falha no histórico não impede a execução da tarefa
+        self.id = None
+        try:
+            conn = conectar(self.db_path)
+            with conn:
+                self.id = conn.execute(
+                    "INSERT INTO execucoes (tarefa, gatilho, inicio) VALUES (?, ?, ?)",
+                    (tarefa, gatilho, self.inicio)
+                ).lastrowid
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"[run_history] Não foi possível registrar o início de {tarefa}: {e}")
+
+    def acompanhar(self, proc):
+        """Passa a medir o pico de RSS do processo (Popen) desta execução."""
+        if psutil is not None and self._monitor is None:
+            self._monitor = MonitorRSS(proc.pid)
+            self._monitor.start()
+
+    def finalizar(self, returncode: int = None, bytes_saida: int = None, erro: str = None):
+        if self.finalizada:
+            return
+        self.finalizada = True
+        pico_rss = self._monitor.parar() if self._monitor is not None else None
+        duracao = time.perf_counter() - self._t0
+        if self.id is None:
+            return
+        try:
+            conn = conectar(self.db_path)
+            with conn:
+                conn.execute(
+                    "UPDATE execucoes SET fim = ?, duracao = ?, returncode = ?, bytes_saida = ?, pico_rss = ?, erro = ? "
+                    "WHERE id = ?",
+                    (self.inicio + duracao, duracao, returncode, bytes_saida, pico_rss, erro, self.id)
+                )
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"[run_history] Não foi possível registrar o fim de {self.tarefa}: {e}")
+
+@contextmanager
+def registrar_execucao(tarefa: str, gatilho: str, db_path: str = None):
+    """Cria a Execucao e garante que ela seja finalizada (com o erro, se houver)."""
+    execucao = Execucao(tarefa, gatilho, db_path)
+    try:
+        yield execucao
+    except BaseException as e:
+        execucao.finalizar(erro=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        execucao.finalizar()
+
+###############################################################################
+# Consultas
+###############################################################################
+def _ler(sql: str, params=(), db_path: str = None) -> pd.DataFrame:
+    conn = conectar(db_path)
+    try:
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+
+def _filtros(tarefa=None, desde=None, ate=None):
+    """WHERE por tarefa e período (epoch, date ou datetime)."""
+    condicoes, params = [], []
+    if tarefa:
+        condicoes.append("tarefa = ?")
+        params.append(tarefa)
+    if desde is not None:
+        condicoes.append("inicio >= ?")
+        params.append(_epoch(desde))
+    if ate is not None:
+        condicoes.append("inicio < ?")
+        params.append(_epoch(ate))
+    return (" WHERE " + " AND ".join(condicoes)) if condicoes else "", params
+
+def _epoch(valor) -> float:
+    """epoch de um número, date ou datetime (sem fuso = horário local)."""
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    valor = pd.Timestamp(valor)
+    return valor.timestamp() if valor.tzinfo else time.mktime(valor.timetuple())
+
+def _para_datetime(serie: pd.Series) -> pd.Series:
+    """epoch -> datetime no horário local (vazio continua vazio)."""
+    return pd.to_datetime(serie.map(lambda v: datetime.fromtimestamp(v) if pd.notna(v) else None))
+
+def tarefas(db_path: str = None) -> list:
+    """Tarefas com pelo menos uma execução registrada."""
+    return _ler("SELECT DISTINCT tarefa FROM execucoes ORDER BY tarefa", db_path=db_path)["tarefa"].tolist()
+
+def listar_execucoes(tarefa: str = None, desde=None, ate=None, limite: int = 500, db_path: str = None) -> pd.DataFrame:
+    """Execuções (mais recentes primeiro), com inicio/fim como datetime local."""
+    where, params = _filtros(tarefa, desde, ate)
+    df = _ler(
+        "SELECT id, tarefa, gatilho, inicio, fim, duracao, returncode, bytes_saida, pico_rss, erro "
+        f"FROM execucoes{where} ORDER BY inicio DESC LIMIT ?",
+        (*params, int(limite)), db_path
+    )
+    for coluna in ("inicio", "fim"):
+        df[coluna] = _para_datetime(df[coluna])
+    return df
+
+def resumo_por_tarefa(desde=None, ate=None, db_path: str = None) -> pd.DataFrame:
+    """Por tarefa: execuções, falhas, em andamento, duração média/máxima e última execução."""
+    where, params = _filtros(None, desde, ate)
+    df = _ler(
+        "SELECT tarefa, COUNT(*) AS execucoes, "
+        "SUM(CASE WHEN (returncode IS NOT NULL AND returncode != 0) OR erro IS NOT NULL THEN 1 ELSE 0 END) AS falhas, "
+        "SUM(CASE WHEN fim IS NULL THEN 1 ELSE 0 END) AS sem_fim, "
+        "AVG(duracao) AS duracao_media, MAX(duracao) AS duracao_max, "
+        "MAX(pico_rss) AS pico_rss_max, MAX(inicio) AS ultima "
+        f"FROM execucoes{where} GROUP BY tarefa ORDER BY tarefa",
+        params, db_path
+    )
+    df["ultima"] = _para_datetime(df["ultima"])
+    return df
+
+def duracoes_diarias(tarefa: str, desde=None, ate=None, db_path: str = None) -> pd.DataFrame:
+    """Por dia (horário local): execuções e duração total/máxima de 'tarefa' (só as finalizadas)."""
+    where, params = _filtros(tarefa, desde, ate)
+    df = _ler(
+        f"SELECT DATE(inicio, 'unixepoch', 'localtime') AS dia, COUNT(*) AS execucoes, "
+        "SUM(duracao) AS duracao_total, MAX(duracao) AS duracao_max "
+        f"FROM execucoes{where}{' AND' if where else ' WHERE'} fim IS NOT NULL "
+        "GROUP BY dia ORDER BY dia",
+        params, db_path
+    )
+    df["dia"] = pd.to_datetime(df["dia"])
+    return df
@@ -0,0 +1,112 @@
+# state_files.py
+#
+# Gravação atômica dos arquivos de estado (rotinas_config.json,
+# schedule_config.json, knowledge_base.csv...): o conteúdo vai para um
+# temporário na mesma pasta, recebe fsync e só então substitui o original
+# com os.replace. Quem lê (ex.: o scheduler, que relê o schedule_config.json
+# a cada segundo) vê o arquivo antigo ou o novo inteiro, nunca pela metade.
+#
+# 'bloquear=True' serializa escritores concorrentes com um filelock
+# ("<arquivo>.lock"), para leitura-modificação-escrita sem perder alterações.
+
+import os
+import json
+import time
+import tempfile
+from contextlib import contextmanager
+
+try:
+    from filelock import FileLock
+except ImportError:  # sem filelock, a gravação continua atômica, só sem o lock
+    FileLock = None
+
+# Bancos SQLite em WAL (histórico, cache do LLM...) ficam numa pasta local da
+# máquina: no compartilhamento SMB do projeto o WAL não é confiável
+PASTA_LOCAL = "automacoes"
+
+def caminho_local(nome: str, variavel: str = None) -> str:
+    """
+    os.getenv(variavel), se definida; senão 'nome' em %LOCALAPPDATA%\\automacoes
+    (ou na pasta temporária, fora do Windows), criando a pasta.
+    """
+    caminho = os.getenv(variavel) if variavel else None
+    if caminho:
+        return caminho
+    pasta = os.path.join(os.getenv("LOCALAPPDATA") or tempfile.gettempdir(), PASTA_LOCAL)
+    os.makedirs(pasta, exist_ok=True)
+    return os.path.join(pasta, nome)
+
+# No Windows o os.replace falha se outro processo estiver com o destino aberto
+# naquele instante; tenta de novo algumas vezes antes de desistir
+TENTATIVAS_REPLACE = 10
+ESPERA_REPLACE = 0.05
+
+@contextmanager
+def bloqueio(caminho: str, timeout: float = 30):
+    """Lock entre processos para o arquivo (no-op se filelock não estiver instalado)."""
+    if FileLock is None:
+        yield
+        return
+    with FileLock(caminho + ".lock", timeout=timeout):
+        yield
+
+def _substituir(origem: str, destino: str):
+    for tentativa in range(TENTATIVAS_REPLACE):
+        try:
+            os.replace(origem, destino)
+            return
+        except PermissionError:
+            if tentativa == TENTATIVAS_REPLACE - 1:
+                raise
+            time.sleep(ESPERA_REPLACE)
+
+def gravar_bytes(caminho: str, conteudo: bytes, bloquear: bool = False):
+    """Grava 'conteudo' em 'caminho' via temporário + fsync + os.replace."""
+    caminho = os.path.abspath(caminho)
+    pasta = os.path.dirname(caminho)
+
+    def _gravar():
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(caminho) + ".", suffix=".tmp", dir=pasta)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(conteudo)
+                f.flush()
+                os.fsync(f.fileno())
+            _substituir(tmp, caminho)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    if bloquear:
+        with bloqueio(caminho):
+            _gravar()
+    else:
+        _gravar()
+
+def gravar_texto(caminho: str, texto: str, encoding: str = "utf-8", bloquear: bool = False):
+    gravar_bytes(caminho, texto.encode(encoding), bloquear=bloquear)
+
+def gravar_json(caminho: str, dados, indent: int = 4, bloquear: bool = False):
+    """json.dump atômico (mesmo formato de antes: indent=4)."""
+    gravar_texto(caminho, json.dumps(dados, indent=indent), bloquear=bloquear)
+
+def ler_texto(caminho: str, encoding: str = "utf-8") -> str:
+    with open(caminho, "r", encoding=encoding) as f:
+        return f.read()
+
+def ler_json(caminho: str):
+    """
+    Lê o JSON inteiro. Com todas as gravações passando por este módulo,
+    o conteúdo lido é sempre uma versão completa do arquivo.
+    """
+    content = ler_texto(caminho).strip()
+    if not content:
+        raise ValueError("Arquivo JSON está vazio.")
+    return json.loads(content)
+
+def gravar_csv(caminho: str, data, bloquear: bool = False, **kwargs):
+    """DataFrame.to_csv atômico (mesmos argumentos do to_csv)."""
+    encoding = kwargs.pop("encoding", "utf-8")
+    texto = data.to_csv(**kwargs)
+    gravar_texto(caminho, texto, encoding=encoding, bloquear=bloquear)
@@ -0,0 +1,193 @@
+# task_executor.py
+#
+# Executor das tarefas agendadas: um número fixo de threads (limite global)
+# e, por tarefa, um máximo de execuções simultâneas (padrão 1). Quando o
+# disparo chega com a tarefa já no limite, a política da tarefa decide:
+#   - "skip":     descarta o disparo;
+#   - "queue":    enfileira (até 'max_fila' disparos pendentes da tarefa);
+#   - "coalesce": enfileira só se ainda não houver um pendente; disparos
+#                 seguintes se juntam a ele (roda uma vez quando liberar).
+# Profundidade da fila e tempo de espera ficam em estatisticas().
+
+import time
+import threading
+from collections import deque
+
+POLITICAS = ("skip", "queue", "coalesce")
+
+INICIADA = "iniciada"
+ENFILEIRADA = "enfileirada"
+PULADA = "pulada"
+AGRUPADA = "agrupada"
+
+class _Tarefa:
+    """Limites e contadores de uma tarefa."""
+
+    def __init__(self, max_concorrencia: int = 1, politica: str = "coalesce", max_fila: int = 10):
+        if politica not in POLITICAS:
+            raise ValueError(f"Política inválida: {politica}")
+        self.max_concorrencia = max(1, int(max_concorrencia))
+        self.politica = politica
+        self.max_fila = max_fila
+        self.ativos = 0
+        self.pendentes = 0
+        self.execucoes = 0
+        self.puladas = 0
+        self.agrupadas = 0
+        self.espera_ultima = 0.0
+        self.espera_max = 0.0
+        self.espera_total = 0.0
+
+class ExecutorTarefas:
+    """
+    executor = ExecutorTarefas(max_workers=2)
+    executor.configurar("principal", max_concorrencia=1, politica="coalesce")
+    executor.submeter("principal", funcao, "principal")  # -> "iniciada" | "enfileirada" | "pulada" | "agrupada"
+    """
+
+    def __init__(self, max_workers: int = 2, politica_padrao: str = "coalesce"):
+        self.max_workers = max(1, int(max_workers))
+        self.politica_padrao = politica_padrao
+        self._tarefas = {}
+        self._fila = deque()  # (nome, fn, args, enfileirado_em), em ordem de chegada
+        self._ocupados = 0
+        self._threads = []
+        self._cond = threading.Condition()
+
+    def configurar(self, nome: str, max_concorrencia: int = 1, politica: str = None, max_fila: int = 10):
+        """Define os limites de 'nome' (mantém os contadores se já existia)."""
+        with self._cond:
+            nova = _Tarefa(max_concorrencia, politica or self.politica_padrao, max_fila)
+            antiga = self._tarefas.get(nome)
+            if antiga is not None:
+                for campo in ("ativos", "pendentes", "execucoes", "puladas", "agrupadas",
+                              "espera_ultima", "espera_max", "espera_total"):
+                    setattr(nova, campo, getattr(antiga, campo))
+            self._tarefas[nome] = nova
+            self._cond.notify_all()
+
+    def _tarefa(self, nome: str) -> _Tarefa:
+        tarefa = self._tarefas.get(nome)
+        if tarefa is None:
+            tarefa = self._tarefas[nome] = _Tarefa(politica=self.politica_padrao)
+        return tarefa
+
+    def submeter(self, nome: str, fn, *args) -> str:
+        """Entrega um disparo de 'nome' ao executor; devolve o que foi feito com ele."""
+        with self._cond:
+            tarefa = self._tarefa(nome)
+            no_limite = tarefa.ativos + tarefa.pendentes >= tarefa.max_concorrencia
+
+            if no_limite:
+                if tarefa.politica == "skip":
+                    tarefa.puladas += 1
+                    return PULADA
+                if tarefa.politica == "coalesce" and tarefa.pendentes:
+                    tarefa.agrupadas += 1
+                    return AGRUPADA
+                if tarefa.pendentes >= tarefa.max_fila:
+                    tarefa.puladas += 1
+                    return PULADA
+
+            tarefa.pendentes += 1
+            item = (nome, fn, args, time.monotonic())
+            self._fila.append(item)
+            self._iniciar_threads()
+            self._cond.notify_all()
+            return INICIADA if self._sera_iniciado(item) else ENFILEIRADA
+
+    def _sera_iniciado(self, alvo) -> bool:
+        """
+        Se 'alvo' sai da fila já na próxima rodada dos workers livres: repete
+        a escolha do _proximo() sobre a fila (chamado com o lock). Itens
+        barrados só pelo limite da própria tarefa não ocupam worker.
+        """
+        livres = self.max_workers - self._ocupados
+        ativos = {}
+        for item in self._fila:
+            if livres <= 0:
+                return False
+            nome = item[0]
+            tarefa = self._tarefas[nome]
+            em_uso = ativos.get(nome, tarefa.ativos)
+            if em_uso < tarefa.max_concorrencia:
+                if item is alvo:
+                    return True
+                ativos[nome] = em_uso + 1
+                livres -= 1
+        return False
+
+    def _iniciar_threads(self):
+        while len(self._threads) < self.max_workers:
+            th = threading.Thread(target=self._worker, name=f"executor-{len(self._threads)}", daemon=True)
+            self._threads.append(th)
+            th.start()
+
+    def _proximo(self):
+        """Primeiro item da fila cuja tarefa tem vaga (chamado com o lock)."""
+        for i, item in enumerate(self._fila):
+            tarefa = self._tarefas[item[0]]
+            if tarefa.ativos < tarefa.max_concorrencia:
+                del self._fila[i]
+                return item
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                item = self._proximo()
+                while item is None:
+                    self._cond.wait()
+                    item = self._proximo()
+                nome, fn, args, enfileirado_em = item
+                tarefa = self._tarefas[nome]
+                espera = time.monotonic() - enfileirado_em
+                tarefa.pendentes -= 1
+                tarefa.ativos += 1
+                tarefa.execucoes += 1
+                tarefa.espera_ultima = espera
+                tarefa.espera_max = max(tarefa.espera_max, espera)
+                tarefa.espera_total += espera
+                self._ocupados += 1
+            try:
+                fn(*args)
+            except Exception:
+                pass  # quem submete trata os próprios erros (ex.: thread_executar_tarefa)
+            finally:
+                with self._cond:
+                    # Relê: configurar() pode ter trocado o objeto da tarefa
+                    self._tarefas[nome].ativos -= 1
+                    self._ocupados -= 1
+                    self._cond.notify_all()
+
+    def profundidade_fila(self, nome: str = None) -> int:
+        """Disparos esperando (de 'nome', ou de todas as tarefas)."""
+        with self._cond:
+            if nome is not None:
+                tarefa = self._tarefas.get(nome)
+                return tarefa.pendentes if tarefa else 0
+            return len(self._fila)
+
+    def estatisticas(self) -> dict:
+        """{tarefa: {ativos, na_fila, execucoes, puladas, agrupadas, espera_*}} + '__total__'."""
+        with self._cond:
+            stats = {}
+            for nome, t in self._tarefas.items():
+                stats[nome] = {
+                    "ativos": t.ativos,
+                    "na_fila": t.pendentes,
+                    "max_concorrencia": t.max_concorrencia,
+                    "politica": t.politica,
+                    "execucoes": t.execucoes,
+                    "puladas": t.puladas,
+                    "agrupadas": t.agrupadas,
+                    "espera_ultima": round(t.espera_ultima, 3),
+                    "espera_max": round(t.espera_max, 3),
+                    "espera_media": round(t.espera_total / t.execucoes, 3) if t.execucoes else 0.0,
+                }
+            stats["__total__"] = {
+                "workers": self.max_workers,
+                "ocupados": self._ocupados,
+                "na_fila": len(self._fila),
+            }
+            return stats